@@ -7,14 +7,18 @@ from factcheck.utils.llmclient import CLIENTS, model2client
 from factcheck.utils.prompt import prompt_mapper
 from factcheck.utils.logger import CustomLogger
 from factcheck.utils.api_config import load_api_config
-from factcheck.utils.data_class import PipelineUsage, FactCheckOutput, ClaimDetail, FCSummary
-from factcheck.core.Retriever.serper_retriever import SerperEvidenceRetriever
+from factcheck.utils.data_class import PipelineUsage, FactCheckOutput, ClaimDetail, FCSummary, Evidence
+from factcheck.utils.semantic_cache import SemanticVerdictCache
 from factcheck.core import (
     Decompose,
     Checkworthy,
     QueryGenerator,
     retriever_mapper,
     ClaimVerify,
+    NLIClaimVerify,
+    EvidenceReranker,
+    EvidenceDeduplicator,
+    QueryBudget,
 )
 
 logger = CustomLogger(__name__).getlog()
@@ -34,6 +38,7 @@ class FactCheck:
         claim_verify_model: str = None,  # "gpt-3.5-turbo",
         api_config: dict = None,
         num_seed_retries: int = 3,
+        claim_verifier: str = "llm",
     ):
         # TODO: better handle raw token count
         self.encoding = tiktoken.get_encoding("cl100k_base")
@@ -67,8 +72,36 @@ class FactCheck:
         self.decomposer = Decompose(llm_client=self.decompose_model, prompt=self.prompt)
         self.checkworthy = Checkworthy(llm_client=self.checkworthy_model, prompt=self.prompt)
         self.query_generator = QueryGenerator(llm_client=self.query_generator_model, prompt=self.prompt)
-        self.evidence_crawler = SerperEvidenceRetriever( llm_client=self.evidence_retrieval_model, api_config=self.api_config)
-        self.claimverify = ClaimVerify(llm_client=self.claim_verify_model, prompt=self.prompt)
+        Retriever = retriever_mapper(retriever_name=retriever)
+        self.evidence_crawler = Retriever(llm_client=self.evidence_retrieval_model, api_config=self.api_config)
+        if claim_verifier == "nli":
+            # local cross-encoder NLI, no API call in the verification step
+            self.claimverify = NLIClaimVerify(llm_client=self.claim_verify_model, prompt=self.prompt)
+        elif claim_verifier == "llm":
+            early_stop_k = self.api_config.get("VERIFY_EARLY_STOP_K")
+            early_stop_min_score = self.api_config.get("VERIFY_EARLY_STOP_MIN_SCORE")
+            self.claimverify = ClaimVerify(
+                llm_client=self.claim_verify_model,
+                prompt=self.prompt,
+                early_stop_k=int(early_stop_k) if early_stop_k else None,
+                early_stop_min_score=float(early_stop_min_score) if early_stop_min_score is not None else None,
+            )
+        else:
+            raise NotImplementedError(f"Claim verifier {claim_verifier} not found!")
+        # collapse duplicate evidences of a claim, then optionally rerank them by relevance, before verification
+        self.evidence_deduplicator = EvidenceDeduplicator.from_config(self.api_config)
+        # optional relevance rerank of the evidences before verification
+        self.evidence_reranker = EvidenceReranker.from_config(self.api_config)
+        # reuse the verification of recently checked claims worded differently, see SEMANTIC_CACHE
+        self.verdict_cache = SemanticVerdictCache.from_config(self.api_config)
+        # search the claim itself first, generate more queries only for claims with weak evidence
+        self.progressive_retrieval = bool(self.api_config.get("PROGRESSIVE_RETRIEVAL", False))
+        self.progressive_threshold = float(self.api_config.get("PROGRESSIVE_RETRIEVAL_THRESHOLD", 0.5))
+        self.progressive_min_evidences = int(self.api_config.get("PROGRESSIVE_RETRIEVAL_MIN_EVIDENCES", 2))
+        self.evidence_scorer = None
+        if self.progressive_retrieval:
+            self.evidence_scorer = self.evidence_reranker or EvidenceReranker(top_k=None)
+        self._progressive_threshold_checked = False
         self.attr_list = ["decomposer", "checkworthy", "query_generator", "evidence_crawler", "claimverify"]
         self.num_seed_retries = num_seed_retries
         # record last timing breakdown for markdown/table output
@@ -85,6 +118,8 @@ class FactCheck:
         self._reset_usage()
 
         st_time = time.time()
+        # optional per-document budget of searches, LLM calls and tokens, see QUERY_BUDGET_*
+        budget = QueryBudget.from_config(self.api_config)
         # step 1
         claims = self.decomposer.getclaims(doc=raw_text, num_retries=self.num_seed_retries)
         # Parallel run restore claims and checkworthy
@@ -96,13 +131,19 @@ class FactCheck:
             future_checkworthy_claims = executor.submit(
                 self.checkworthy.identify_checkworthiness, claims, num_retries=self.num_seed_retries
             )
-            # step 3
-            future_claim_queries_dict = executor.submit(self.query_generator.generate_query, claims=claims)
+            # step 3, in progressive mode queries are generated in step 4, only for claims with weak evidence; with a
+            # budget, after checkworthiness, so that only checkworthy claims that fit in the budget cost a call
+            future_claim_queries_dict = None
+            if not self.progressive_retrieval and budget is None:
+                future_claim_queries_dict = executor.submit(self.query_generator.generate_query, claims=claims)
 
             # Wait for all futures to complete
             claim2doc = future_claim2doc.result()
             checkworthy_claims, claim2checkworthy = future_checkworthy_claims.result()
-            claim_queries_dict = future_claim_queries_dict.result()
+            if future_claim_queries_dict is not None:
+                claim_queries_dict = future_claim_queries_dict.result()
+            else:
+                claim_queries_dict = {claim: [claim] for claim in claims}
 
         checkworthy_claims_S = set(checkworthy_claims)
         claim_queries_dict = {k: v for k, v in claim_queries_dict.items() if k in checkworthy_claims_S}
@@ -118,17 +159,78 @@ class FactCheck:
         # for k, v in claim_queries_dict.items():
         #     logger.info(f"== Claim: {k} --- Queries: {v}")
 
+        if budget is not None:
+            # calls already made, retries included: decomposition, claim restoring and checkworthiness
+            self._sync_budget(budget)
+            if not self.progressive_retrieval:
+                # claims left without generated queries are searched with the claim itself
+                claims_for_queries = budget.allocate_llm_calls(list(claim_queries_dict.keys()))
+                if claims_for_queries:
+                    claim_queries_dict.update(self.query_generator.generate_query(claims=claims_for_queries))
+
         step123_time = time.time()
 
-        # step 4
-        claim_evidences_dict = self.evidence_crawler.retrieve_evidence(claim_queries_dict=claim_queries_dict)
+        # claims verified recently, possibly worded differently, reuse that verification
+        claim2cache_hit = {}
+        if self.verdict_cache is not None:
+            claim2cache_hit = self.verdict_cache.lookup(list(claim_queries_dict.keys()))
+            logger.info(f"== Verdict cache hits: {len(claim2cache_hit)} of {len(claim_queries_dict)} claims")
+        claims_to_check = {k: v for k, v in claim_queries_dict.items() if k not in claim2cache_hit}
+        if budget is not None:
+            claims_to_check = budget.allocate_queries(claims_to_check)
+
+        # step 4, the parse time is kept per call, the retriever is shared by concurrent requests
+        claim_evidences_dict = {}
+        retrieve_timing = {}
+        if claims_to_check and self.progressive_retrieval:
+            claim_queries_dict, claim_evidences_dict = self._retrieve_progressively(
+                claim_queries_dict, claims_to_check, budget=budget, timing=retrieve_timing
+            )
+        elif claims_to_check:
+            claim_evidences_dict = self.evidence_crawler.retrieve_evidence(
+                claim_queries_dict=claims_to_check, timing=retrieve_timing
+            )
+        if self.evidence_deduplicator is not None:
+            claim_evidences_dict = self.evidence_deduplicator.dedup(claim_evidences_dict)
+        if self.evidence_reranker is not None:
+            # evidences of progressive retrieval's first round are scored already, by the same model
+            claim_evidences_dict = self.evidence_reranker.rerank(
+                claim_evidences_dict,
+                scored_by=self.evidence_scorer.model_name if self.progressive_retrieval else None,
+            )
+        if budget is not None:
+            # one verification per evidence, an LLM call unless verified by the local NLI model
+            self._sync_budget(budget)
+            claim_evidences_dict = budget.allocate_evidences(
+                claim_evidences_dict,
+                count_tokens=self._count_verify_tokens,
+                llm_calls=not isinstance(self.claimverify, NLIClaimVerify),
+            )
         # for claim, evidences in claim_evidences_dict.items():
         #     logger.info(f"== Claim: {claim}")
         #     logger.info(f"== Evidence: {evidences}\n")
         step4_time = time.time()
 
         # step 5
-        claim_verifications_dict = self.claimverify.verify_claims(claim_evidences_dict=claim_evidences_dict)
+        claim_verifications_dict = {claim: [] for claim in claim_evidences_dict}
+        claims_with_evidences = {k: v for k, v in claim_evidences_dict.items() if v}
+        if claims_with_evidences:
+            claim_verifications_dict.update(self.claimverify.verify_claims(claim_evidences_dict=claims_with_evidences))
+        if budget is not None:
+            # report the actual spending, retries may exceed the limits
+            self._sync_budget(budget)
+        if self.verdict_cache is not None:
+            # only claims with a verdict, "No evidence found." may come from a transient search failure
+            self.verdict_cache.add(
+                {
+                    claim: [asdict(e) for e in evidences]
+                    for claim, evidences in claim_verifications_dict.items()
+                    if any(e.relationship in ("SUPPORTS", "REFUTES") for e in evidences)
+                }
+            )
+        for claim, hit in claim2cache_hit.items():
+            claim_verifications_dict[claim] = [Evidence(**{**e, "claim": claim}) for e in hit["evidences"]]
+            claim_evidences_dict[claim] = [{"text": e["text"], "url": e["url"]} for e in hit["evidences"]]
         for k, v in claim_verifications_dict.items():
             logger.info(f"== Claim: {k} --- Verify: {v}")
         step5_time = time.time()
@@ -142,6 +244,8 @@ class FactCheck:
             "retrieve_time_seconds": round(step4_time - step123_time, 4),
             "verify_time_seconds": round(step5_time - step4_time, 4),
             "total_time_seconds": round(step5_time - st_time, 4),
+            # worker time spent parsing crawled pages, part of the retrieve step
+            "parse_time_seconds": round(retrieve_timing.get("parse_seconds", 0.0), 4),
         }
 
         claim_detail = self._merge_claim_details(
@@ -150,9 +254,90 @@ class FactCheck:
             claim2queries=claim_queries_dict,
             claim2evidences=claim_evidences_dict,
             claim2verifications=claim_verifications_dict,
+            claim2cache_hit=claim2cache_hit,
+            claim2budget_skipped=budget.skipped if budget is not None else None,
+        )
+
+        return self._finalize_factcheck(raw_text=raw_text, claim_detail=claim_detail, return_dict=True, budget=budget)
+
+    def _retrieve_progressively(
+        self, claim_queries_dict: dict, claims_to_check: dict, budget: QueryBudget = None, timing: dict = None
+    ):
+        """Retrieve evidences with the claims themselves, then with generated queries for claims with weak evidence.
+
+        A claim's evidence is weak when fewer than `progressive_min_evidences` of its evidences reach a relevance
+        score of `progressive_threshold`. Only those claims cost a query generation call and further searches.
+
+        Args:
+            claim_queries_dict (dict): all checkworthy claims and their queries.
+            claims_to_check (dict): the claims to retrieve evidences for, and their queries (the claim itself).
+            budget (QueryBudget, optional): the document budget the query generation and searches are taken from.
+            timing (dict, optional): passed to the retriever, collects the parse time of both rounds.
+
+        Returns:
+            tuple: the claim_queries_dict with the generated queries of the weak claims, and the claims' evidences.
+        """
+        claim_evidences_dict = self.evidence_crawler.retrieve_evidence(claim_queries_dict=claims_to_check, timing=timing)
+
+        if not self._progressive_threshold_checked:
+            # once the scorer is loaded, warn if even a clearly relevant pair would count as weak evidence
+            self.evidence_scorer.check_threshold(self.progressive_threshold)
+            self._progressive_threshold_checked = True
+        claim_evidence_list = [(claim, e) for claim, evidences in claim_evidences_dict.items() for e in evidences]
+        scores = self.evidence_scorer.score([(claim, e["text"]) for claim, e in claim_evidence_list])
+        num_confident = {claim: 0 for claim in claims_to_check}
+        # the score is kept on the evidence, so that the reranker does not score it again; copied, an evidence
+        # found by a query shared by several claims may be the same dict under each of them
+        claim_evidences_dict = {claim: [] for claim in claim_evidences_dict}
+        for (claim, evidence), score in zip(claim_evidence_list, scores):
+            claim_evidences_dict[claim].append({**evidence, "rerank_score": round(score, 4)})
+            if score >= self.progressive_threshold:
+                num_confident[claim] += 1
+        weak_claims = [claim for claim, n in num_confident.items() if n < self.progressive_min_evidences]
+        logger.info(f"== Progressive retrieval: {len(weak_claims)} of {len(claims_to_check)} claims need more queries")
+        if budget is not None:
+            weak_claims = budget.allocate_llm_calls(weak_claims)
+        if not weak_claims:
+            return claim_queries_dict, claim_evidences_dict
+
+        # the claim itself was searched already, search only the generated queries
+        generated_queries_dict = self.query_generator.generate_query(claims=weak_claims)
+        extra_queries_dict = {claim: queries[1:] for claim, queries in generated_queries_dict.items() if queries[1:]}
+        if budget is not None:
+            extra_queries_dict = budget.allocate_queries(extra_queries_dict)
+        if extra_queries_dict:
+            extra_evidences_dict = self.evidence_crawler.retrieve_evidence(
+                claim_queries_dict=extra_queries_dict, timing=timing
+            )
+            for claim, evidences in extra_evidences_dict.items():
+                claim_evidences_dict[claim] = claim_evidences_dict.get(claim, []) + evidences
+        claim_queries_dict = {**claim_queries_dict, **generated_queries_dict}
+        return claim_queries_dict, claim_evidences_dict
+
+    def get_coalescing_stats(self) -> dict:
+        """Return how many LLM and search calls were shared with identical in-flight calls (process-wide)."""
+        stats = {"llm": self.decompose_model.get_coalescing_stats()}
+        if hasattr(self.evidence_crawler, "get_coalescing_stats"):
+            stats["search"] = self.evidence_crawler.get_coalescing_stats()
+        return stats
+
+    def _used_tokens(self) -> int:
+        usage = self._get_usage()
+        return sum(
+            (getattr(usage, attr).prompt_tokens or 0) + (getattr(usage, attr).completion_tokens or 0)
+            for attr in self.attr_list
         )
 
-        return self._finalize_factcheck(raw_text=raw_text, claim_detail=claim_detail, return_dict=True)
+    def _used_llm_calls(self) -> int:
+        return sum(getattr(self, attr).llm_client.num_calls for attr in self.attr_list)
+
+    def _sync_budget(self, budget: QueryBudget):
+        budget.sync(llm_calls=self._used_llm_calls(), tokens=self._used_tokens())
+
+    def _count_verify_tokens(self, claim: str, evidence: dict) -> int:
+        # prompt tokens of the verification call, the completion is short
+        evidence = {"text": evidence["text"], "url": evidence["url"]}
+        return len(self.encoding.encode(self.prompt.verify_prompt.format(claim=claim, evidence=evidence)))
 
     def _get_usage(self):
         return PipelineUsage(**{attr: getattr(self, attr).llm_client.usage for attr in self.attr_list})
@@ -162,8 +347,17 @@ class FactCheck:
             getattr(self, attr).llm_client.reset_usage()
 
     def _merge_claim_details(
-        self, claim2doc: dict, claim2checkworthy: dict, claim2queries: dict, claim2evidences: dict, claim2verifications: dict
+        self,
+        claim2doc: dict,
+        claim2checkworthy: dict,
+        claim2queries: dict,
+        claim2evidences: dict,
+        claim2verifications: dict,
+        claim2cache_hit: dict = None,
+        claim2budget_skipped: dict = None,
     ) -> list[ClaimDetail]:
+        claim2cache_hit = claim2cache_hit or {}
+        claim2budget_skipped = claim2budget_skipped or {}
         claim_details = []
         for i, (claim, origin) in enumerate(claim2doc.items()):
             if claim in claim2verifications:
@@ -172,7 +366,9 @@ class FactCheck:
 
                 evidences = claim2verifications.get(claim, {})
                 labels = list(map(lambda x: x.relationship, evidences))
-                if labels.count("SUPPORTS") + labels.count("REFUTES") == 0:
+                if not labels and claim2budget_skipped.get(claim, {}).get("evidences"):
+                    factuality = "Skipped by budget."
+                elif labels.count("SUPPORTS") + labels.count("REFUTES") == 0:
                     factuality = "No evidence found."
                 else:
                     factuality = labels.count("SUPPORTS") / (labels.count("REFUTES") + labels.count("SUPPORTS"))
@@ -188,6 +384,25 @@ class FactCheck:
                     queries=claim2queries[claim],
                     evidences=evidences,
                     factuality=factuality,
+                    cache_hit={k: v for k, v in claim2cache_hit[claim].items() if k != "evidences"}
+                    if claim in claim2cache_hit
+                    else None,
+                    budget_skipped=claim2budget_skipped.get(claim),
+                )
+            elif claim in claim2budget_skipped and claim in claim2queries:
+                # checkworthy, but no search left in the document budget
+                claim_obj = ClaimDetail(
+                    id=i,
+                    claim=claim,
+                    checkworthy=True,
+                    checkworthy_reason=claim2checkworthy.get(claim, "No reason provided, please report issue."),
+                    origin_text=origin["text"],
+                    start=origin["start"],
+                    end=origin["end"],
+                    queries=claim2queries[claim],
+                    evidences=[],
+                    factuality="Skipped by budget.",
+                    budget_skipped=claim2budget_skipped[claim],
                 )
             else:
                 claim_obj = ClaimDetail(
@@ -206,7 +421,7 @@ class FactCheck:
         return claim_details
 
     def _finalize_factcheck(
-        self, raw_text: str, claim_detail: list[ClaimDetail] = None, return_dict: bool = True
+        self, raw_text: str, claim_detail: list[ClaimDetail] = None, return_dict: bool = True, budget: QueryBudget = None
     ) -> FactCheckOutput:
         verified_claims = list(filter(lambda x: not isinstance(x.factuality, str), claim_detail))
         num_claims = len(claim_detail)
@@ -234,6 +449,7 @@ class FactCheck:
             usage=self._get_usage(),
             claim_detail=claim_detail,
             summary=summary,
+            budget=budget.stats() if budget is not None else None,
         )
 
         if not output.attribute_check():
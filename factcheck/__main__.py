@@ -23,7 +23,12 @@ def check(args):
         api_config = {}
 
     factcheck = FactCheck(
-        default_model=args.model, client=args.client, api_config=api_config, prompt=args.prompt, retriever=args.retriever
+        default_model=args.model,
+        client=args.client,
+        api_config=api_config,
+        prompt=args.prompt,
+        retriever=args.retriever,
+        claim_verifier=args.verifier,
     )
 
     content = modal_normalization(args.modal, args.input)
@@ -45,6 +50,7 @@ if __name__ == "__main__":
     parser.add_argument("--client", type=str, default=None, choices=CLIENTS.keys())
     parser.add_argument("--prompt", type=str, default="chatgpt_prompt")
     parser.add_argument("--retriever", type=str, default="serper")
+    parser.add_argument("--verifier", type=str, default="llm", choices=["llm", "nli"])
     parser.add_argument("--modal", type=str, default="text")
     parser.add_argument("--input", type=str, default="demo_data/text.txt")
     parser.add_argument("--api_config", type=str, default="factcheck/config/api_config.yaml")
@@ -35,18 +35,21 @@ class Checkworthy:
             user_input = prompt.format(texts=joint_texts)
 
         messages = self.llm_client.construct_message_list([user_input])
-        for i in range(num_retries):
-            response = self.llm_client.call(messages, num_retries=1, seed=42 + i)
+        # the last answer parsed, returned with every text as checkworthy when no answer is valid
+        parsed = {"claim2checkworthy": {}}
+
+        def parse(response):
             try:
                 response = response.strip("```json\n").strip("```")
                 # 确保 response 不为空字符串
                 if not response.strip():
                     print("Received an empty response. Skipping this iteration.")
-                    continue
+                    return None
 
                 # 去除多余的空格和换行符
                 response = response.strip()
                 claim2checkworthy =  json.loads(response)
+                parsed["claim2checkworthy"] = claim2checkworthy
                 valid_answer = list(
                     filter(
                         lambda x: x[1].startswith("Yes") or x[1].startswith("No"),
@@ -56,8 +59,14 @@ class Checkworthy:
                 checkworthy_claims = list(filter(lambda x: x[1].startswith("Yes"), claim2checkworthy.items()))
                 checkworthy_claims = list(map(lambda x: x[0], checkworthy_claims))
                 assert len(valid_answer) == len(claim2checkworthy)
-                break
+                return checkworthy_claims, claim2checkworthy
             except Exception as e:
                 logger.error(f"====== Error: {e}, the LLM response is: {response}")
                 logger.error(f"====== Our input is: {messages}")
-        return checkworthy_claims, claim2checkworthy
+            return None
+
+        # seeds 42, 43, ... one after the other, or concurrently with LLM_SEED_SAMPLING
+        result = self.llm_client.call_until_valid(messages, parse, num_retries=num_retries)
+        if result is None:
+            return checkworthy_claims, parsed["claim2checkworthy"]
+        return result
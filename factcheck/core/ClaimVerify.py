@@ -4,20 +4,28 @@ import json
 import concurrent.futures
 from factcheck.utils.logger import CustomLogger
 from factcheck.utils.data_class import Evidence
+from factcheck.utils.model_registry import get_cross_encoder
+from factcheck.utils.utils import make_length_batches
 
 logger = CustomLogger(__name__).getlog()
 
 
 class ClaimVerify:
-    def __init__(self, llm_client, prompt):
+    def __init__(self, llm_client, prompt, early_stop_k: int = None, early_stop_min_score: float = None):
         """Initialize the ClaimVerify class
 
         Args:
             llm_client (BaseClient): The LLM client used for verifying the factuality of claims.
             prompt (BasePrompt): The prompt used for verifying the factuality of claims.
+            early_stop_k (int, optional): stop verifying a claim once its first k evidences agree (all SUPPORTS or
+                all REFUTES), the remaining evidences are marked SKIPPED. Verify all evidences if None. Defaults to None.
+            early_stop_min_score (float, optional): rerank score each of the k agreeing evidences must reach, any
+                score if None (or if the evidences were not reranked). Defaults to None.
         """
         self.llm_client = llm_client
         self.prompt = prompt
+        self.early_stop_k = early_stop_k
+        self.early_stop_min_score = early_stop_min_score
 
     def verify_claims(self, claim_evidences_dict, prompt: str = None) -> dict[str, list[Evidence]]:
         """Verify the factuality of the claims with respect to the given evidences
@@ -52,6 +60,48 @@ class ClaimVerify:
             logger.info(f"Warning: LLM response parse fail, retry {attempts}.")
             return None
 
+    def _verify_pairs(
+        self,
+        claim_evidence_list: list[tuple[str, dict]],
+        num_retries=3,
+        prompt: str = None,
+        max_workers=10,
+    ) -> list[dict]:
+        """Verify (claim, evidence) pairs, re-issuing each call whose response can not be parsed.
+
+        Returns:
+            list[dict]: the parsed {"reasoning", "relationship"} of each pair, None where every attempt failed.
+        """
+        messages_list = []
+        for claim, e in claim_evidence_list:
+            # only the evidence itself goes into the prompt, not the rerank score or merged urls recorded on it
+            e = {"text": e["text"], "url": e["url"]}
+            if prompt is None:
+                user_input = self.prompt.verify_prompt.format(claim=claim, evidence=e)
+            else:
+                user_input = prompt.format(claim=claim, evidence=e)
+            messages_list.append(user_input)
+        # every pair is retried on its own as soon as its response fails to parse
+        _message_list = self.llm_client.construct_message_list(messages_list)
+        factual_results = self.llm_client.multi_call_parsed(
+            _message_list, parse=self._process_single_response, num_retries=num_retries
+        )
+        return factual_results
+
+    def _is_settled(self, evidences: list[dict], verifications: list[dict]) -> bool:
+        """Whether the first `early_stop_k` evidences of a claim agree, so the rest can not change its verdict much."""
+        if len(verifications) < self.early_stop_k:
+            return False
+        relationships = set()
+        for evidence, verification in zip(evidences[: self.early_stop_k], verifications[: self.early_stop_k]):
+            if verification is None:
+                return False
+            score = evidence.get("rerank_score")
+            if self.early_stop_min_score is not None and score is not None and score < self.early_stop_min_score:
+                return False
+            relationships.add(verification.get("relationship"))
+        return relationships in ({"SUPPORTS"}, {"REFUTES"})
+
     def _verify_all_claims(
         self,
         claim_evidences_dict: dict[str, list[str]],
@@ -61,6 +111,9 @@ class ClaimVerify:
     ) -> dict[str, list[Evidence]]:
         """Verify the factuality of the claims with respect to the given evidences
 
+        With `early_stop_k`, the first k evidences of every claim are verified first, and the remaining evidences
+        only for the claims they did not settle.
+
         Args:
             claim_evidences_dict (dict): a dictionary of claims and their corresponding evidences.
             num_retries (int, optional): maximum attempts for GPT to verify the factuality of the claims. Defaults to 3.
@@ -70,43 +123,55 @@ class ClaimVerify:
         Returns:
             list[dict[str, any]]: a list of relationship results, including evidence, reasoning, relationship.
         """
-        attempts = 0
         # construct user inputs with respect to each claim and its evidences
-        claim_evidence_list = []
-        messages_list = []
-        for claim, _evidences in claim_evidences_dict.items():
-            for e in _evidences:
-                if prompt is None:
-                    user_input = self.prompt.verify_prompt.format(claim=claim, evidence=e)
-                else:
-                    user_input = prompt.format(claim=claim, evidence=e)
-                claim_evidence_list.append((claim, e))
-                messages_list.append(user_input)
-        factual_results = [None] * len(messages_list)
-
-        while (attempts < num_retries) and (None in factual_results):
-            _messages = [_message for _i, _message in enumerate(messages_list) if factual_results[_i] is None]
-            _indices = [_i for _i, _message in enumerate(messages_list) if factual_results[_i] is None]
-
-            _message_list = self.llm_client.construct_message_list(_messages)
-            _response_list = self.llm_client.multi_call(_message_list)
-            
-            # 使用线程池并发处理响应
-            with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(_response_list))) as executor:
-                # 创建处理任务
-                future_to_index = {
-                    executor.submit(self._process_single_response, _response, attempts): i
-                    for i, (_response, _index) in enumerate(zip(_response_list, _indices))
-                }
-                
-                # 收集处理结果
-                for future in concurrent.futures.as_completed(future_to_index):
-                    i = future_to_index[future]
-                    result = future.result()
-                    if result is not None:
-                        factual_results[_indices[i]] = result
-            
-            attempts += 1
+        claim_evidence_list = [(claim, e) for claim, _evidences in claim_evidences_dict.items() for e in _evidences]
+        factual_results = [None] * len(claim_evidence_list)
+
+        if self.early_stop_k is None:
+            first_indices = list(range(len(claim_evidence_list)))
+        else:
+            # position of every pair among its claim's evidences, in the given (rerank) order
+            positions, counts = [], {}
+            for claim, _ in claim_evidence_list:
+                positions.append(counts.get(claim, 0))
+                counts[claim] = positions[-1] + 1
+            first_indices = [i for i, position in enumerate(positions) if position < self.early_stop_k]
+        first_results = self._verify_pairs(
+            [claim_evidence_list[i] for i in first_indices], num_retries=num_retries, prompt=prompt, max_workers=max_workers
+        )
+        for i, result in zip(first_indices, first_results):
+            factual_results[i] = result
+
+        skipped_indices = []
+        if self.early_stop_k is not None and len(first_indices) < len(claim_evidence_list):
+            claim_results = {claim: [] for claim in claim_evidences_dict.keys()}
+            for i in first_indices:
+                claim_results[claim_evidence_list[i][0]].append(factual_results[i])
+            settled = {
+                claim
+                for claim, results in claim_results.items()
+                if self._is_settled(claim_evidences_dict[claim], results)
+            }
+            rest_indices = [i for i in range(len(claim_evidence_list)) if positions[i] >= self.early_stop_k]
+            skipped_indices = [i for i in rest_indices if claim_evidence_list[i][0] in settled]
+            rest_indices = [i for i in rest_indices if claim_evidence_list[i][0] not in settled]
+            logger.info(
+                f"Early stop settled {len(settled)} claims, skipped {len(skipped_indices)} of {len(claim_evidence_list)} verifications."
+            )
+            if rest_indices:
+                rest_results = self._verify_pairs(
+                    [claim_evidence_list[i] for i in rest_indices],
+                    num_retries=num_retries,
+                    prompt=prompt,
+                    max_workers=max_workers,
+                )
+                for i, result in zip(rest_indices, rest_results):
+                    factual_results[i] = result
+        for i in skipped_indices:
+            factual_results[i] = {
+                "reasoning": f"[Early stop] Not verified, the first {self.early_stop_k} evidences settled the claim.",
+                "relationship": "SKIPPED",
+            }
 
         _template_results = {
             "reasoning": "[System Warning] Can not identify the factuality of the claim.",
@@ -131,3 +196,115 @@ class ClaimVerify:
             claim_verifications_dict[e.claim].append(e)
 
         return claim_verifications_dict
+
+
+class NLIClaimVerify(ClaimVerify):
+    """Verify claims with a local cross-encoder NLI model instead of LLM calls.
+
+    All (evidence, claim) pairs of a request are scored together on CPU. Pairs are sorted by length and grouped
+    into batches bounded by both pair count and total characters, so short pairs are not padded to the longest
+    evidence in the request.
+    """
+
+    # fallback label order of the cross-encoder/nli-* checkpoints, used when the model config has no id2label
+    DEFAULT_LABELS = ["contradiction", "entailment", "neutral"]
+    LABEL2RELATIONSHIP = {
+        "contradiction": "REFUTES",
+        "entailment": "SUPPORTS",
+        "neutral": "IRRELEVANT",
+    }
+
+    def __init__(
+        self,
+        llm_client=None,
+        prompt=None,
+        model_name: str = "cross-encoder/nli-deberta-v3-xsmall",
+        backend: str = "torch",
+        quantize: bool = False,
+        onnx_file_name: str = None,
+        batch_size: int = 32,
+        max_batch_chars: int = 32000,
+        max_length: int = 512,
+        min_confidence: float = 0.5,
+    ):
+        """Initialize the NLIClaimVerify class
+
+        Args:
+            llm_client (BaseClient, optional): kept for token usage bookkeeping, no LLM call is made.
+            prompt (BasePrompt, optional): unused, kept for interface compatibility with ClaimVerify.
+            model_name (str, optional): the NLI cross-encoder checkpoint. Defaults to "cross-encoder/nli-deberta-v3-xsmall".
+            backend (str, optional): "torch" or "onnx". Defaults to "torch".
+            quantize (bool, optional): use int8 weights (dynamic quantization on torch, qint8 export on onnx). Defaults to False.
+            onnx_file_name (str, optional): the ONNX export to load on onnx, e.g. a qint8 export for the local CPU,
+                see `load_cross_encoder`. Defaults to None.
+            batch_size (int, optional): maximum number of pairs per forward pass. Defaults to 32.
+            max_batch_chars (int, optional): maximum number of characters per forward pass. Defaults to 32000.
+            max_length (int, optional): maximum number of tokens per pair. Defaults to 512.
+            min_confidence (float, optional): SUPPORTS/REFUTES below this probability fall back to IRRELEVANT. Defaults to 0.5.
+        """
+        super().__init__(llm_client=llm_client, prompt=prompt)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_batch_chars = max_batch_chars
+        self.min_confidence = min_confidence
+        # shared by all verifiers of the process using the same model settings
+        self.model = get_cross_encoder(
+            model_name,
+            max_length=max_length,
+            device="cpu",
+            backend=backend,
+            quantize=quantize,
+            onnx_file_name=onnx_file_name,
+        )
+
+        id2label = getattr(getattr(self.model, "config", None), "id2label", None)
+        if id2label and all(str(v).lower() in self.LABEL2RELATIONSHIP for v in id2label.values()):
+            self.labels = [str(id2label[i]).lower() for i in range(len(id2label))]
+        else:
+            self.labels = self.DEFAULT_LABELS
+
+    def _make_batches(self, pairs: list[tuple[str, str]]) -> list[list[int]]:
+        """Group pair indices into length-sorted batches bounded by pair count and total characters."""
+        return make_length_batches(pairs, batch_size=self.batch_size, max_batch_chars=self.max_batch_chars)
+
+    def _to_verification(self, probs) -> dict:
+        probs = [float(p) for p in probs]
+        best = max(range(len(probs)), key=lambda i: probs[i])
+        label = self.labels[best]
+        relationship = self.LABEL2RELATIONSHIP[label]
+        if relationship != "IRRELEVANT" and probs[best] < self.min_confidence:
+            relationship = "IRRELEVANT"
+        scores = ", ".join(f"{_label}={_prob:.3f}" for _label, _prob in zip(self.labels, probs))
+        return {"reasoning": f"[NLI {self.model_name}] {scores}", "relationship": relationship}
+
+    def _verify_all_claims(
+        self,
+        claim_evidences_dict: dict[str, list[str]],
+        num_retries=3,
+        prompt: str = None,
+        max_workers=10,
+    ) -> dict[str, list[Evidence]]:
+        """Verify the factuality of the claims with respect to the given evidences by NLI
+
+        Args:
+            claim_evidences_dict (dict): a dictionary of claims and their corresponding evidences.
+            num_retries, prompt, max_workers: unused, kept for interface compatibility with ClaimVerify.
+
+        Returns:
+            dict: a dictionary of claims and their relationship to each evidence, including evidence, reasoning, relationship.
+        """
+        claim_evidence_list = [(claim, e) for claim, _evidences in claim_evidences_dict.items() for e in _evidences]
+        pairs = [(e["text"], claim) for claim, e in claim_evidence_list]
+
+        verifications = [None] * len(pairs)
+        for batch in self._make_batches(pairs):
+            probs = self.model.predict(
+                [pairs[i] for i in batch], batch_size=len(batch), apply_softmax=True, show_progress_bar=False
+            )
+            for i, _probs in zip(batch, probs):
+                verifications[i] = self._to_verification(_probs)
+
+        claim_verifications_dict = {k: [] for k in claim_evidences_dict.keys()}
+        for (claim, evidence), verification in zip(claim_evidence_list, verifications):
+            claim_verifications_dict[claim].append(Evidence(claim=claim, **evidence, **verification))
+        return claim_verifications_dict
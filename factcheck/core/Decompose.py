@@ -48,21 +48,26 @@ class Decompose:
         else:
             user_input = prompt.format(doc=doc).strip()
 
-        claims = None
         messages = self.llm_client.construct_message_list([user_input])
-        for i in range(num_retries):
-            response = self.llm_client.call(
-                messages=messages,
-                num_retries=1,
-                seed=42 + i,
-            )
+        # the last list parsed, returned even if empty when no attempt gives a non-empty one
+        parsed = {"claims": None}
+
+        def parse(response):
             try:
                 claims = eval(response)["claims"]
-                if isinstance(claims, list) and len(claims) > 0:
-                    break
+                if isinstance(claims, list):
+                    parsed["claims"] = claims
+                    if len(claims) > 0:
+                        return claims
             except Exception as e:
                 logger.error(f"Parse LLM response error {e}, response is: {response}")
                 logger.error(f"Parse LLM response error, prompt is: {messages}")
+            return None
+
+        # seeds 42, 43, ... one after the other, or concurrently with LLM_SEED_SAMPLING
+        claims = self.llm_client.call_until_valid(messages, parse, num_retries=num_retries)
+        if claims is None:
+            claims = parsed["claims"]
         if isinstance(claims, list):
             return claims
         else:
@@ -151,20 +156,18 @@ class Decompose:
 
         messages = self.llm_client.construct_message_list([user_input])
 
+        # a restore with misplaced spans, returned when no attempt restores every claim
         tmp_restore = {}
-        for i in range(num_retries):
-            response = self.llm_client.call(
-                messages=messages,
-                num_retries=1,
-                seed=42 + i,
-            )
+
+        def parse(response):
+            nonlocal tmp_restore
             try:
                 # 去除多余的 Markdown 代码块标记
                 response = response.strip("```json\n").strip("```")
                 # 确保 response 不为空字符串
                 if not response.strip():
                     print("Received an empty response. Skipping this iteration.")
-                    continue
+                    return None
 
                 # 去除多余的空格和换行符
                 response = response.strip()
@@ -180,5 +183,10 @@ class Decompose:
             except Exception as e:
                 logger.error(f"Parse LLM response error {e}, response is: {response}")
                 logger.error(f"Parse LLM response error, prompt is: {messages}")
+            return None
 
-        return tmp_restore
\ No newline at end of file
+        # seeds 42, 43, ... one after the other, or concurrently with LLM_SEED_SAMPLING
+        claim2doc_detail = self.llm_client.call_until_valid(messages, parse, num_retries=num_retries)
+        if claim2doc_detail is not None:
+            return claim2doc_detail
+        return tmp_restore
@@ -0,0 +1,104 @@
+import hashlib
+
+from factcheck.utils.logger import CustomLogger
+from factcheck.utils.utils import tokenize
+
+logger = CustomLogger(__name__).getlog()
+
+
+def simhash(text: str, ngram: int = 3, bits: int = 64) -> int:
+    """SimHash signature of the token n-grams of a text, close texts get signatures with a small Hamming distance."""
+    tokens = tokenize(text)
+    shingles = [" ".join(tokens[i : i + ngram]) for i in range(max(1, len(tokens) - ngram + 1))]
+    weights = [0] * bits
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=bits // 8).digest(), "big")
+        for i in range(bits):
+            weights[i] += 1 if (h >> i) & 1 else -1
+    return sum(1 << i for i in range(bits) if weights[i] > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class EvidenceDeduplicator:
+    """Collapse redundant evidences of a claim before verification.
+
+    Near-duplicate texts (e.g. a syndicated article, or one page found by several queries) are merged by SimHash,
+    and evidences from the same page when one text contains the other (e.g. a snippet and its extended version).
+    Other evidences sharing a URL, such as different passages of a page or answer boxes under a pseudo-URL, are
+    kept. The longest text of a group is kept; the URLs of the other members are recorded on it as `merged_urls`.
+    """
+
+    def __init__(self, max_hamming_distance: int = 6, ngram: int = 3):
+        """Initialize the EvidenceDeduplicator class
+
+        Args:
+            max_hamming_distance (int, optional): texts whose 64-bit SimHash signatures differ in at most this many
+                bits are near-duplicates, -1 to only merge a page's texts contained in one another. Defaults to 6.
+            ngram (int, optional): number of tokens per shingle. Defaults to 3.
+        """
+        self.max_hamming_distance = max_hamming_distance
+        self.ngram = ngram
+
+    @classmethod
+    def from_config(cls, api_config: dict):
+        """Build the deduplicator from the EVIDENCE_DEDUP* config keys, None if EVIDENCE_DEDUP is off."""
+        api_config = api_config or dict()
+        if not api_config.get("EVIDENCE_DEDUP", True):
+            return None
+        return cls(max_hamming_distance=int(api_config.get("EVIDENCE_DEDUP_MAX_HAMMING_DISTANCE", 6)))
+
+    def dedup(self, claim_evidences_dict: dict[str, list[dict]]) -> dict[str, list[dict]]:
+        """Deduplicate the evidences of every claim.
+
+        Args:
+            claim_evidences_dict (dict): a dictionary of claims and their evidences ({"text", "url"} dicts).
+
+        Returns:
+            dict: the same dictionary with one evidence per group, in the order of first appearance.
+        """
+        deduped = {claim: self._dedup_evidences(evidences) for claim, evidences in claim_evidences_dict.items()}
+        num_before = sum(len(v) for v in claim_evidences_dict.values())
+        num_after = sum(len(v) for v in deduped.values())
+        logger.info(f"Evidence dedup kept {num_after} of {num_before} evidences.")
+        return deduped
+
+    @staticmethod
+    def _is_page_url(url) -> bool:
+        # search APIs label answer boxes and knowledge graphs with pseudo-URLs that several evidences share
+        return isinstance(url, str) and url.startswith(("http://", "https://"))
+
+    def _is_duplicate(self, evidence: dict, signature: int, kept: dict, kept_signature: int) -> bool:
+        """Whether an evidence repeats a kept one: near-duplicate texts, or the same page and one text contains the other.
+
+        The same page alone is not enough, different snippet windows or passages of one page are distinct evidences.
+        """
+        if self.max_hamming_distance >= 0 and hamming_distance(signature, kept_signature) <= self.max_hamming_distance:
+            return True
+        url = evidence.get("url")
+        if not self._is_page_url(url) or url != kept.get("url"):
+            return False
+        text, kept_text = evidence["text"], kept["text"]
+        return text in kept_text or kept_text in text
+
+    def _dedup_evidences(self, evidences: list[dict]) -> list[dict]:
+        # groups of evidences: [kept evidence, its signature, [urls of the group]], in the order of first appearance
+        groups = []
+        for evidence in evidences:
+            signature = simhash(evidence["text"], ngram=self.ngram)
+            for group in groups:
+                if self._is_duplicate(evidence, signature, group[0], group[1]):
+                    if len(evidence["text"]) > len(group[0]["text"]):
+                        group[0], group[1] = evidence, signature
+                    group[2].append(evidence.get("url"))
+                    break
+            else:
+                groups.append([evidence, signature, [evidence.get("url")]])
+
+        deduped = []
+        for evidence, _, urls in groups:
+            merged_urls = list(dict.fromkeys(url for url in urls if url != evidence.get("url")))
+            deduped.append({**evidence, "merged_urls": merged_urls} if merged_urls else evidence)
+        return deduped
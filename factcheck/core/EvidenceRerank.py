@@ -0,0 +1,131 @@
+from factcheck.utils.logger import CustomLogger
+from factcheck.utils.model_registry import get_cross_encoder
+
+logger = CustomLogger(__name__).getlog()
+
+# a (claim, evidence) pair any relevance model should score high, used to sanity check score thresholds
+CALIBRATION_PAIR = (
+    "The Eiffel Tower is located in Paris.",
+    "The Eiffel Tower is a wrought-iron lattice tower on the Champ de Mars in Paris, France.",
+)
+
+
+class EvidenceReranker:
+    """Score (claim, evidence) pairs with a relevance cross-encoder and keep only the best evidences.
+
+    Every evidence left after reranking costs one verification call, so pruning near-duplicate and irrelevant
+    snippets here cuts the verification cost proportionally. The score is the sigmoid of the model's relevance
+    logit, in [0, 1], and is recorded on each kept evidence as `rerank_score`. A clearly relevant pair scores
+    close to 1, an unrelated one close to 0.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        top_k: int = 5,
+        threshold: float = None,
+        batch_size: int = 32,
+        max_length: int = 512,
+        passage_ranker=None,
+    ):
+        """Initialize the EvidenceReranker class
+
+        Args:
+            model_name (str, optional): the relevance cross-encoder. Defaults to "cross-encoder/ms-marco-MiniLM-L-6-v2".
+            top_k (int, optional): evidences kept per claim, all if None. Defaults to 5.
+            threshold (float, optional): evidences scored below it are dropped, no threshold if None. Defaults to None.
+            batch_size (int, optional): number of pairs per forward pass. Defaults to 32.
+            max_length (int, optional): maximum number of tokens per pair. Defaults to 512.
+            passage_ranker (CrossEncoder, optional): an already loaded cross-encoder to use instead of the shared
+                one from the model registry. Defaults to None.
+        """
+        self.top_k = top_k
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.model_name = model_name
+        self.max_length = max_length
+        self._model = passage_ranker
+
+    @property
+    def model(self):
+        # loaded on first use; the retriever's passage ranker checkpoint resolves to the same shared model
+        return self._model or get_cross_encoder(self.model_name, max_length=self.max_length)
+
+    @classmethod
+    def from_config(cls, api_config: dict, passage_ranker=None):
+        """Build the reranker from the EVIDENCE_RERANK_* config keys, None if EVIDENCE_RERANK is off."""
+        api_config = api_config or dict()
+        if not api_config.get("EVIDENCE_RERANK", False):
+            return None
+        threshold = api_config.get("EVIDENCE_RERANK_THRESHOLD")
+        top_k = api_config.get("EVIDENCE_RERANK_TOP_K", 5)
+        return cls(
+            model_name=api_config.get("EVIDENCE_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+            top_k=int(top_k) if top_k is not None else None,
+            threshold=float(threshold) if threshold is not None else None,
+            passage_ranker=passage_ranker,
+        )
+
+    def score(self, pairs: list[tuple[str, str]]) -> list[float]:
+        """Relevance of each (claim, evidence text) pair, in [0, 1]."""
+        if not pairs:
+            return []
+        import torch
+
+        # the sigmoid is applied once, by predict; pass it explicitly so a checkpoint configured with another
+        # activation (e.g. Identity) still yields [0, 1] scores
+        scores = self.model.predict(
+            pairs, batch_size=self.batch_size, show_progress_bar=False, activation_fn=torch.nn.Sigmoid()
+        )
+        return [float(score) for score in scores]
+
+    def check_threshold(self, threshold: float) -> bool:
+        """Whether a clearly relevant (claim, evidence) pair scores at least `threshold`, warn if it does not.
+
+        A threshold no relevant pair can reach (e.g. one calibrated on another model's scores) would mark every
+        evidence as irrelevant.
+        """
+        score = self.score([CALIBRATION_PAIR])[0]
+        if score < threshold:
+            logger.warning(
+                f"Relevance threshold {threshold} is above the score {score:.4f} of a clearly relevant pair with "
+                f"{self.model_name}, no evidence would pass it."
+            )
+            return False
+        return True
+
+    def rerank(self, claim_evidences_dict: dict[str, list[dict]], scored_by: str = None) -> dict[str, list[dict]]:
+        """Keep the top-k evidences above the threshold for every claim, scored in a single batched pass.
+
+        Args:
+            claim_evidences_dict (dict): a dictionary of claims and their evidences ({"text", "url"} dicts).
+            scored_by (str, optional): the model that computed the `rerank_score` some evidences already carry,
+                e.g. progressive retrieval's scorer. If it is this reranker's model, those evidences are not scored
+                again. Defaults to None, score every evidence.
+
+        Returns:
+            dict: the same dictionary with the kept evidences sorted by score, each with a `rerank_score`.
+        """
+        claim_evidence_list = [(claim, e) for claim, _evidences in claim_evidences_dict.items() for e in _evidences]
+        reuse_scores = scored_by is not None and scored_by == self.model_name
+        to_score = [
+            i for i, (_, e) in enumerate(claim_evidence_list) if not reuse_scores or e.get("rerank_score") is None
+        ]
+        scores = [e.get("rerank_score") for _, e in claim_evidence_list]
+        new_scores = self.score([(claim_evidence_list[i][0], claim_evidence_list[i][1]["text"]) for i in to_score])
+        for i, score in zip(to_score, new_scores):
+            scores[i] = score
+        if len(to_score) < len(claim_evidence_list):
+            logger.info(f"Evidence rerank reused the scores of {len(claim_evidence_list) - len(to_score)} evidences.")
+
+        reranked = {claim: [] for claim in claim_evidences_dict.keys()}
+        for (claim, evidence), score in zip(claim_evidence_list, scores):
+            if self.threshold is None or score >= self.threshold:
+                reranked[claim].append({**evidence, "rerank_score": round(score, 4)})
+        for claim, evidences in reranked.items():
+            evidences.sort(key=lambda e: e["rerank_score"], reverse=True)
+            reranked[claim] = evidences[: self.top_k] if self.top_k is not None else evidences
+
+        num_kept = sum(len(v) for v in reranked.values())
+        logger.info(f"Evidence rerank kept {num_kept} of {len(claim_evidence_list)} evidences.")
+        return reranked
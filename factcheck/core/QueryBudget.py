@@ -0,0 +1,180 @@
+import re
+
+from factcheck.utils.logger import CustomLogger
+
+logger = CustomLogger(__name__).getlog()
+
+SPECIFIC_TOKEN_PATTERN = re.compile(r"\d+(?:[.,]\d+)*|\b[A-Z][\w-]*")
+
+
+def claim_priority(claim: str) -> int:
+    """Checkworthiness priority of a claim: the number of numbers and capitalized names it mentions.
+
+    Specific claims (figures, dates, named people and organizations) are the ones a reader is most likely to act
+    on and the ones a search can settle, so they are served first when the budget runs out.
+    """
+    # the first character is dropped so that the capital starting the sentence does not count
+    return len(SPECIFIC_TOKEN_PATTERN.findall(claim[1:]))
+
+
+def evidence_uncertainty(evidences: list[dict]) -> float:
+    """1 - the best rerank score of the evidences, 0.5 when they were not reranked, 1 when there are none."""
+    scores = [e["rerank_score"] for e in evidences if e.get("rerank_score") is not None]
+    if scores:
+        return 1 - max(scores)
+    return 0.5 if evidences else 1.0
+
+
+class QueryBudget:
+    """Per-document budget of searches, LLM calls and tokens, shared out across the claims by priority.
+
+    Without a budget the number of searches grows with claims x queries per claim and the number of verification
+    calls with claims x evidences, so one long document can cost hundreds of calls. The budget is spent in rounds:
+    every claim, highest priority first, gets one query (or evidence) per round until the budget or the claims'
+    queries (evidences) run out. Claims that are more specific come first and, among evidences, claims whose
+    evidences are less conclusive. What did not fit is recorded per claim in `skipped`.
+
+    A budget object holds the remaining amounts of one document, create one per `check_text` call.
+    """
+
+    def __init__(self, max_searches: int = None, max_llm_calls: int = None, max_tokens: int = None):
+        """Initialize the QueryBudget class
+
+        Args:
+            max_searches (int, optional): search calls per document, unlimited if None. Defaults to None.
+            max_llm_calls (int, optional): LLM calls per document, unlimited if None. Defaults to None.
+            max_tokens (int, optional): LLM tokens (prompt and completion) per document, unlimited if None.
+                Defaults to None.
+        """
+        self.max_searches = max_searches
+        self.max_llm_calls = max_llm_calls
+        self.max_tokens = max_tokens
+        self.searches = 0
+        self.llm_calls = 0
+        self.tokens = 0
+        # claim -> {"queries": [...], "evidences": [urls], "query_generation": True}
+        self.skipped = {}
+
+    @classmethod
+    def from_config(cls, api_config: dict):
+        """Build the budget from the QUERY_BUDGET_* config keys, None if none of them is set."""
+        api_config = api_config or dict()
+        limits = {
+            "max_searches": api_config.get("QUERY_BUDGET_SEARCHES"),
+            "max_llm_calls": api_config.get("QUERY_BUDGET_LLM_CALLS"),
+            "max_tokens": api_config.get("QUERY_BUDGET_TOKENS"),
+        }
+        if all(v is None for v in limits.values()):
+            return None
+        return cls(**{k: int(v) if v is not None else None for k, v in limits.items()})
+
+    @staticmethod
+    def _remaining(limit: int, used: int) -> float:
+        return float("inf") if limit is None else max(limit - used, 0)
+
+    def sync(self, llm_calls: int, tokens: int):
+        """Replace the LLM calls and tokens spent so far with the amounts counted by the LLM clients.
+
+        Allocations reserve one call per query generation or verification, but retries, duplicates of slow calls
+        and extra seeds cost more, and decomposition and checkworthiness are not allocated at all. Call it once
+        the allocated calls are made, so that the next allocation starts from the actual spending.
+        """
+        self.llm_calls = llm_calls
+        self.tokens = tokens
+
+    def _skip(self, claim: str, key: str, items: list):
+        if items:
+            self.skipped.setdefault(claim, {}).setdefault(key, []).extend(items)
+
+    def _round_robin(
+        self, claim_items: dict[str, list], order: list[str], fits, skip_key: str, skip_record=None
+    ) -> dict[str, list]:
+        """Give each claim in `order` one item per round while `fits(claim, item)` accepts it.
+
+        The items that do not fit are recorded in `skipped`, as `skip_record(item)` if it is given.
+        """
+        kept = {claim: [] for claim in claim_items}
+        exhausted = set()
+        depth = 0
+        while len(exhausted) < len(order):
+            for claim in order:
+                if claim in exhausted:
+                    continue
+                if depth >= len(claim_items[claim]) or not fits(claim, claim_items[claim][depth]):
+                    exhausted.add(claim)
+                    continue
+                kept[claim].append(claim_items[claim][depth])
+            depth += 1
+        for claim, items in claim_items.items():
+            skipped = items[len(kept[claim]) :]
+            self._skip(claim, skip_key, [skip_record(item) for item in skipped] if skip_record else skipped)
+        return kept
+
+    def allocate_queries(self, claim_queries_dict: dict[str, list[str]]) -> dict[str, list[str]]:
+        """Keep the queries that fit in the search budget, a claim's first query (the claim itself) first.
+
+        Returns:
+            dict: the claims with at least one kept query and their kept queries.
+        """
+        order = sorted(claim_queries_dict, key=claim_priority, reverse=True)
+
+        def fits(claim, query):
+            if self._remaining(self.max_searches, self.searches) < 1:
+                return False
+            self.searches += 1
+            return True
+
+        kept = self._round_robin(claim_queries_dict, order, fits, skip_key="queries")
+        return {claim: queries for claim, queries in kept.items() if queries}
+
+    def allocate_llm_calls(self, claims: list[str], key: str = "query_generation") -> list[str]:
+        """Keep the highest priority claims that fit in the LLM call budget, one call each."""
+        order = sorted(claims, key=claim_priority, reverse=True)
+        num_kept = int(min(len(order), self._remaining(self.max_llm_calls, self.llm_calls)))
+        self.llm_calls += num_kept
+        for claim in order[num_kept:]:
+            self.skipped.setdefault(claim, {})[key] = True
+        return [claim for claim in claims if claim in set(order[:num_kept])]
+
+    def allocate_evidences(self, claim_evidences_dict: dict[str, list[dict]], count_tokens=None, llm_calls: bool = True):
+        """Keep the evidences whose verification fits in the LLM call and token budgets.
+
+        Args:
+            claim_evidences_dict (dict): a dictionary of claims and their evidences ({"text", "url"} dicts).
+            count_tokens (callable, optional): estimated tokens of verifying a (claim, evidence) pair, tokens are
+                not budgeted if None. Defaults to None.
+            llm_calls (bool, optional): whether a verification is an LLM call (False for the NLI verifier).
+                Defaults to True.
+
+        Returns:
+            dict: the same dictionary with the evidences that fit, in their original order.
+        """
+        order = sorted(
+            claim_evidences_dict,
+            key=lambda claim: (claim_priority(claim), evidence_uncertainty(claim_evidences_dict[claim])),
+            reverse=True,
+        )
+
+        def fits(claim, evidence):
+            if llm_calls and self._remaining(self.max_llm_calls, self.llm_calls) < 1:
+                return False
+            tokens = count_tokens(claim, evidence) if count_tokens is not None and self.max_tokens is not None else 0
+            if tokens > self._remaining(self.max_tokens, self.tokens):
+                return False
+            self.llm_calls += int(llm_calls)
+            self.tokens += tokens
+            return True
+
+        # only the urls of the skipped evidences are recorded, their texts would bloat the output
+        return self._round_robin(claim_evidences_dict, order, fits, skip_key="evidences", skip_record=lambda e: e["url"])
+
+    def stats(self) -> dict:
+        return {
+            "max_searches": self.max_searches,
+            "max_llm_calls": self.max_llm_calls,
+            "max_tokens": self.max_tokens,
+            "searches": self.searches,
+            "llm_calls": self.llm_calls,
+            "tokens": self.tokens,
+            "num_claims_with_skips": len(self.skipped),
+        }
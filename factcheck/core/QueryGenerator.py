@@ -17,6 +17,28 @@ class QueryGenerator:
         self.prompt = prompt
         self.max_query_per_claim = max_query_per_claim
 
+    def _parse_response(self, response: str, attempts: int):
+        """Parse the generated questions from a LLM response, None if it can not be parsed."""
+        try:
+            # 去除多余的 Markdown 代码块标记
+            _response = response.strip("```json\n").strip("```")
+
+            # 确保 response 不为空字符串
+            if not _response.strip():
+                print("Received an empty response. Skipping this iteration.")
+                return None
+
+            # 去除多余的空格和换行符
+            _response = _response.strip()
+
+            # claim2doc = eval(response)
+            _questions = json.loads(_response)["Questions"]
+            # _questions = eval(_response)["Questions"]
+            return _questions if _questions else None
+        except:  # noqa: E722
+            logger.info(f"Warning: LLM response parse fail, retry {attempts}.")
+            return None
+
     def generate_query(self, claims: list[str], generating_time: int = 3, prompt: str = None) -> dict[str, list[str]]:
         """Generate questions for the given claims
 
@@ -27,9 +49,6 @@ class QueryGenerator:
         Returns:
             dict: a dictionary of claims and their corresponding generated questions.
         """
-        generated_questions = [[]] * len(claims)
-        attempts = 0
-
         # construct messages
         messages_list = []
         for claim in claims:
@@ -39,33 +58,12 @@ class QueryGenerator:
                 user_input = prompt.format(claim=claim)
             messages_list.append(user_input)
 
-        while (attempts < generating_time) and ([] in generated_questions):
-            _messages = [_message for _i, _message in enumerate(messages_list) if generated_questions[_i] == []]
-            _indices = [_i for _i, _message in enumerate(messages_list) if generated_questions[_i] == []]
-
-            _message_list = self.llm_client.construct_message_list(_messages)
-            _response_list = self.llm_client.multi_call(_message_list)
-
-            for _response, _index in zip(_response_list, _indices):
-                try:
-                    # 去除多余的 Markdown 代码块标记
-                    _response = _response.strip("```json\n").strip("```")
-
-                    # 确保 response 不为空字符串
-                    if not _response.strip():
-                        print("Received an empty response. Skipping this iteration.")
-                        continue
-
-                    # 去除多余的空格和换行符
-                    _response = _response.strip()
-
-                    # claim2doc = eval(response)
-                    _questions = json.loads(_response)["Questions"]
-                    # _questions = eval(_response)["Questions"]
-                    generated_questions[_index] = _questions
-                except:  # noqa: E722
-                    logger.info(f"Warning: LLM response parse fail, retry {attempts}.")
-            attempts += 1
+        # every claim is retried on its own as soon as its response fails to parse
+        _message_list = self.llm_client.construct_message_list(messages_list)
+        _questions_list = self.llm_client.multi_call_parsed(
+            _message_list, parse=self._parse_response, num_retries=generating_time
+        )
+        generated_questions = [_questions or [] for _questions in _questions_list]
 
         # ensure that each claim has at least one question which is the claim itself
         claim_query_dict = {
@@ -1,9 +1,13 @@
 from .google_retriever import GoogleEvidenceRetriever
 from .serper_retriever import SerperEvidenceRetriever
+from .cloudsway_retriever import CloudswayEvidenceRetriever
+from .local_retriever import LocalEvidenceRetriever
 
 retriever_map = {
     "google": GoogleEvidenceRetriever,
     "serper": SerperEvidenceRetriever,
+    "cloudsway": CloudswayEvidenceRetriever,
+    "local": LocalEvidenceRetriever,
 }
 
 
@@ -1,7 +1,10 @@
-from concurrent.futures import ProcessPoolExecutor
-import os
 from copy import deepcopy
-from factcheck.utils.web_util import parse_response, crawl_web
+from factcheck.utils.web_util import crawl_web_cached, get_crawler
+from factcheck.utils.parse_pool import get_parse_pool, extract_page_text
+from factcheck.utils.cache import get_page_cache
+from factcheck.utils.html_extractor import get_extractor
+from factcheck.utils.model_registry import get_spacy_model, get_spacy_sentencizer, get_cross_encoder
+from factcheck.utils.utils import is_cjk_text, split_cjk_sentences, make_length_batches
 from factcheck.utils.logger import CustomLogger
 
 logger = CustomLogger(__name__).getlog()
@@ -10,17 +13,7 @@ logger = CustomLogger(__name__).getlog()
 class BaseRetriever:
     def __init__(self, llm_client, api_config: dict = None):
         """Initialize the EvidenceRetrieve class."""
-        import spacy
-
-        self.tokenizer = spacy.load("en_core_web_sm", disable=["ner", "tagger", "lemmatizer"])
-        from sentence_transformers import CrossEncoder
-        import torch
-
-        self.passage_ranker = CrossEncoder(
-            "cross-encoder/ms-marco-MiniLM-L-6-v2",
-            max_length=512,
-            device=torch.device("cuda" if torch.cuda.is_available() else "cpu"),
-        )
+        # the spaCy tokenizer and the passage ranker are loaded on first use and shared process-wide
         self.lang = "en"
         self.max_search_result_per_query = 3
         self.sentences_per_passage = 10
@@ -28,6 +21,47 @@ class BaseRetriever:
         self.max_passages_per_search_result_to_return = 5
         assert self.sentences_per_passage > self.sliding_distance
         self.llm_client = llm_client
+        # process-wide pooled crawler for fetching result pages
+        self.crawler = get_crawler(api_config)
+        api_config = api_config or {}
+        # process-wide URL -> page text cache, off unless PAGE_CACHE is set
+        self.page_cache = get_page_cache(api_config)
+        # process-wide worker pool for parsing crawled pages, sized by PARSE_POOL_WORKERS
+        self.parse_pool = get_parse_pool(api_config)
+        self.extractor = get_extractor(
+            api_config.get("HTML_EXTRACTOR", "auto"),
+            remove_boilerplate=bool(api_config.get("HTML_EXTRACTOR_REMOVE_BOILERPLATE", True)),
+        )
+        # "sentencizer" (rule-based, fast) or "parser" (the en_core_web_sm dependency parser)
+        self.sentence_segmenter = api_config.get("SENTENCE_SEGMENTER", "sentencizer")
+        self.segment_n_process = int(api_config.get("SENTENCE_SEGMENT_N_PROCESS", 1))
+        self.segment_batch_size = int(api_config.get("SENTENCE_SEGMENT_BATCH_SIZE", 16))
+        # passage ranker: "torch" or "onnx" backend, optional int8 weights, and on onnx the session's intra-op
+        # thread count and the exported file to load
+        self.ranker_backend = api_config.get("PASSAGE_RANKER_BACKEND", "torch")
+        self.ranker_quantize = bool(api_config.get("PASSAGE_RANKER_QUANTIZE", False))
+        self.ranker_num_threads = api_config.get("PASSAGE_RANKER_NUM_THREADS")
+        self.ranker_onnx_file = api_config.get("PASSAGE_RANKER_ONNX_FILE")
+        self.ranker_batch_size = int(api_config.get("PASSAGE_RANKER_BATCH_SIZE", 64))
+        self.ranker_max_batch_chars = int(api_config.get("PASSAGE_RANKER_MAX_BATCH_CHARS", 64000))
+
+    @property
+    def tokenizer(self):
+        if self.sentence_segmenter == "parser":
+            return get_spacy_model("en_core_web_sm", disable=("ner", "tagger", "lemmatizer"))
+        return get_spacy_sentencizer("en")
+
+    @property
+    def passage_ranker(self):
+        return get_cross_encoder(
+            "cross-encoder/ms-marco-MiniLM-L-6-v2",
+            max_length=512,
+            device="cpu" if self.ranker_backend == "onnx" or self.ranker_quantize else None,
+            backend=self.ranker_backend,
+            quantize=self.ranker_quantize,
+            num_threads=int(self.ranker_num_threads) if self.ranker_num_threads else None,
+            onnx_file_name=self.ranker_onnx_file,
+        )
 
     def set_lang(self, lang: str):
         """Set the language for evidence retrieval.
@@ -45,25 +79,37 @@ class BaseRetriever:
         """
         self.max_search_result_per_query = m
 
-    def retrieve_evidence(self, claim_query_dict):
+    def retrieve_evidence(self, claim_queries_dict, timing: dict = None):
         """Retrieve evidence for a list of claims.
         1. get google search page result by generated questions
         2. crawl all web from urls and extract text
-        3. get relevant snippets from these text
+        3. get relevant snippets from these text, the pages of all claims are processed together
         4. Take top-5 evidences for each question
         5. return single claims evidences;
 
         Args:
-            claim_query_dict (dict): A dictionary of claims and their corresponding queries.
+            claim_queries_dict (dict): A dictionary of claims and their corresponding queries.
+            timing (dict, optional): filled with the "parse_seconds" of this call, per-call so that concurrent
+                requests sharing the retriever do not see each other's. Defaults to None.
 
         Returns:
             dict: A dictionary of claims and their corresponding evidences.
         """
-        claim_evidence_dict = {}
-        for claim, query_list in claim_query_dict.items():
+        claim_query_urls = {}
+        for claim, query_list in claim_queries_dict.items():
             logger.info(f"Collecting evidences for claim : {claim}")
-            evidences = self._retrieve_evidence4singleclaim(claim, query_list=query_list)
-            claim_evidence_dict[claim] = evidences
+            claim_query_urls[claim] = self._get_query_urls(query_list)
+
+        query_url_dict = {}
+        for query_urls in claim_query_urls.values():
+            query_url_dict.update(query_urls)
+        query_scraped_results_dict = self._crawl_and_parse_web(query_url_dict=query_url_dict, timing=timing)
+        query_snippets_dict = self._get_query_snippets(query_scraped_results_dict=query_scraped_results_dict)
+
+        claim_evidence_dict = {}
+        for claim, query_urls in claim_query_urls.items():
+            snippets_dict = {query: query_snippets_dict[query] for query in query_urls if query in query_snippets_dict}
+            claim_evidence_dict[claim] = self._aggregate_snippets(snippets_dict)
         return claim_evidence_dict
 
     def _retrieve_evidence4singleclaim(self, claim: str, query_list: list[str]):
@@ -82,27 +128,29 @@ class BaseRetriever:
         evidences = self._get_relevant_snippets(query_scraped_results_dict=query_scraped_results_dict)
         return evidences
 
-    def _crawl_and_parse_web(self, query_url_dict: dict[str, list]):
-        responses = crawl_web(query_url_dict=query_url_dict)
-        query_responses_dict = dict()
-        for flag, response, url, query in responses:
-            if flag and ".pdf" not in str(response.url):
-                response_list = query_responses_dict.get(query, [])
-                response_list.append([response, url])
-                query_responses_dict[query] = response_list
+    def _crawl_and_parse_web(self, query_url_dict: dict[str, list], timing: dict = None):
+        cached_texts, responses = crawl_web_cached(
+            query_url_dict=query_url_dict, crawler=self.crawler, page_cache=self.page_cache
+        )
+        # the persistent parse pool receives only the page bytes and sends back the extracted text
+        pages = [(response, url, query) for flag, response, url, query in responses if flag and ".pdf" not in str(response.url)]
+        parse_tasks = [(response.content, response.encoding, url, query, self.extractor) for response, url, query in pages]
+        web_texts = dict(cached_texts)
+        parse_seconds = 0.0
+        for i, (web_text, url, query), seconds in self.parse_pool.as_completed_timed(extract_page_text, parse_tasks):
+            parse_seconds += seconds
+            web_texts[(query, url)] = web_text
+            if self.page_cache is not None:
+                self.page_cache.store(url, web_text, pages[i][0])
+        if timing is not None:
+            timing["parse_seconds"] = timing.get("parse_seconds", 0.0) + parse_seconds
 
+        # keep the search result order, whether a page came from the cache or was crawled
         query_scraped_results_dict = dict()
-        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
-            futures = list()
-            for query, response_list in query_responses_dict.items():
-                for response, url in response_list:
-                    future = executor.submit(parse_response, response, url, query)
-                    futures.append(future)
-        for future in futures:
-            web_text, url, query = future.result()
-            scraped_results_list = query_scraped_results_dict.get(query, [])
-            scraped_results_list.append([web_text, url])
-            query_scraped_results_dict[query] = scraped_results_list
+        for query, urls in query_url_dict.items():
+            scraped_results_list = [[web_texts[(query, url)], url] for url in urls if (query, url) in web_texts]
+            if scraped_results_list:
+                query_scraped_results_dict[query] = scraped_results_list
         # Remove URLs if we weren't able to scrape anything or if they are a PDF.
         for query in query_scraped_results_dict.keys():
             scraped_results_list = query_scraped_results_dict.get(query)
@@ -122,10 +170,26 @@ class BaseRetriever:
         Returns:
             dict: A dictionary of queries and their corresponding relevant snippets.
         """
+        snippets_dict = self._get_query_snippets(query_scraped_results_dict=query_scraped_results_dict)
+        return self._aggregate_snippets(snippets_dict)
+
+    def _get_query_snippets(self, query_scraped_results_dict: dict[str:list]):
+        """Chunk the scraped web text of all queries into passages, then score and sort them per query.
+
+        Returns:
+            dict: A dictionary of queries and their top-5 snippets, sorted by retrieval score.
+        """
         # 4+ 5 chunk to split web text to several passage and score and sort
+        query_passages_dict = self._chunk_pages(query_scraped_results_dict)
+        # score the passages of all queries together
+        pairs = [(query, p[0]) for query, passages in query_passages_dict.items() for p in passages]
+        scores = self._score_pairs(pairs)
         snippets_dict = {}
-        for query, scraped_results in query_scraped_results_dict.items():
-            snippets_dict[query] = self._sorted_passage_by_relevant_score(query, scraped_results=scraped_results)
+        i = 0
+        for query, passages in query_passages_dict.items():
+            query_scores = scores[i : i + len(passages)]
+            i += len(passages)
+            snippets_dict[query] = self._sorted_passage_by_relevant_score(query, passages=passages, scores=query_scores)
             snippets_dict[query] = deepcopy(
                 sorted(
                     snippets_dict[query],
@@ -133,7 +197,9 @@ class BaseRetriever:
                     reverse=True,
                 )[:5]
             )
+        return snippets_dict
 
+    def _aggregate_snippets(self, snippets_dict: dict[str:list]):
         evidences = {}
         evidences["aggregated"] = []
         evidences["question_wise"] = deepcopy(snippets_dict)
@@ -146,25 +212,37 @@ class BaseRetriever:
         # 6
         return evidences["aggregated"]
 
-    def _sorted_passage_by_relevant_score(self, query: str, scraped_results: list[str]):
+    def _score_pairs(self, pairs: list[tuple[str, str]]) -> list[float]:
+        """Score (query, passage) pairs with the cross-encoder, in length-bucketed batches.
+
+        Pairs of similar length share a batch, so short passages are not padded to the longest one.
+        """
+        scores = [0.0] * len(pairs)
+        for batch in make_length_batches(pairs, batch_size=self.ranker_batch_size, max_batch_chars=self.ranker_max_batch_chars):
+            batch_scores = self.passage_ranker.predict(
+                [pairs[i] for i in batch], batch_size=len(batch), show_progress_bar=False
+            ).tolist()
+            for i, score in zip(batch, batch_scores):
+                scores[i] = score
+        return scores
+
+    def _sorted_passage_by_relevant_score(self, query: str, passages: list[tuple], scores: list[float] = None):
         """Sort the passages by relevance to the query using a cross-encoder.
 
         Args:
             query (str): The query to sort the passages by relevance.
-            scraped_results (list[str]): A list of scraped web text.
+            passages (list[tuple]): (text, first sentence, last sentence, url) passages of the query's pages.
+            scores (list[float], optional): the passages' cross-encoder scores, computed if None.
 
         Returns:
             list: a list of relevant snippets, where each snippet is a dictionary containing the text, url, sentences per passage, and retrieval score.
         """
         retrieved_passages = list()
-        weball = ""
-        for webtext, url in scraped_results:
-            weball += webtext
-        passages = self._chunk_text(text=weball, tokenizer=self.tokenizer)
         if not passages:
             return []
         # Score the passages by relevance to the query using a cross-encoder.
-        scores = self.passage_ranker.predict([(query, p[0]) for p in passages]).tolist()
+        if scores is None:
+            scores = self._score_pairs([(query, p[0]) for p in passages])
         passage_scores = list(zip(passages, scores))
 
         # Take the top passages_per_search passages for the current search result.
@@ -188,7 +266,7 @@ class BaseRetriever:
                 retrieved_passages.append(
                     {
                         "text": passage_item[0],
-                        "url": url,
+                        "url": passage_item[3],
                         "sents_per_passage": self.sentences_per_passage,
                         "retrieval_score": score,  # Cross-encoder score as retr score
                     }
@@ -198,38 +276,97 @@ class BaseRetriever:
         # print("Total snippets extracted: ", len(retrieved_passages))
         return retrieved_passages
 
-    def _chunk_text(
+    def _segment_texts(self, texts: list[str]) -> list[list[str]]:
+        """Split texts into sentences, in one batch.
+
+        CJK pages go through a punctuation-based splitter; the others are piped through spaCy together
+        (`nlp.pipe`, with SENTENCE_SEGMENT_N_PROCESS worker processes).
+
+        Returns:
+            list[list[str]]: the sentences of every text.
+        """
+        texts = [text[:500000] for text in texts]  # Take 500k chars to not break tokenization.
+        sentences = [[] for _ in texts]
+        spacy_indices = []
+        for i, text in enumerate(texts):
+            if is_cjk_text(text):
+                sentences[i] = split_cjk_sentences(text)
+            else:
+                spacy_indices.append(i)
+        num_done = 0
+        try:
+            docs = self.tokenizer.pipe(
+                (texts[i] for i in spacy_indices), batch_size=self.segment_batch_size, n_process=self.segment_n_process
+            )
+            for i, doc in zip(spacy_indices, docs):
+                sentences[i] = [s.text for s in doc.sents]
+                num_done += 1
+        except UnicodeEncodeError as e:  # Sometimes run into Unicode error when tokenizing.
+            # the pipe is broken, go on one text at a time so that only the failing texts are skipped
+            logger.error(f"Unicode error when using Spacy, segmenting the remaining texts one by one. Error message {e}")
+            for i in spacy_indices[num_done:]:
+                try:
+                    sentences[i] = [s.text for s in self.tokenizer(texts[i]).sents]
+                except UnicodeEncodeError as e:
+                    logger.error(f"Unicode error when using Spacy. Skipping text. Error message {e}")
+        return sentences
+
+    def _chunk_pages(
         self,
-        text: str,
-        tokenizer,
+        query_scraped_results_dict: dict[str:list],
         min_sentence_len: int = 3,
         max_sentence_len: int = 250,
-    ) -> list[str]:
-        """Chunks text into passages using a sliding window.
+    ) -> dict[str, list[tuple]]:
+        """Chunk the pages of all queries into passages using a sliding window, segmenting all pages in one batch.
 
         Args:
-            text: Text to chunk into passages.
+            query_scraped_results_dict (dict): A dictionary of queries and their [web text, url] pairs.
             max_sentence_len: Maximum number of chars of each sentence before being filtered.
         Returns:
-            passages: Chunked passages from the text.
+            dict: A dictionary of queries and their (text, first sentence, last sentence, url) passages. Sentence
+                indices run across the pages of a query.
         """
-        passages = []
-        try:
-            logger.info("========web text len: {} =======".format((len(text))))
-            doc = tokenizer(text[:500000])  # Take 500k chars to not break tokenization.
+        pages = [(query, webtext, url) for query, results in query_scraped_results_dict.items() for webtext, url in results]
+        logger.info("========web text len: {} =======".format(sum(len(webtext) for _, webtext, _ in pages)))
+        page_sentences = self._segment_texts([webtext for _, webtext, _ in pages])
+
+        query_passages_dict = {query: [] for query in query_scraped_results_dict.keys()}
+        sentence_offsets = {query: 0 for query in query_scraped_results_dict.keys()}
+        for (query, webtext, url), sentences in zip(pages, page_sentences):
+            joiner = "" if is_cjk_text(webtext) else " "
             sents = [
-                s.text.replace("\n", " ")
-                for s in doc.sents
-                if min_sentence_len <= len(s.text) <= max_sentence_len  # Long sents are usually metadata.
+                s.replace("\n", " ")
+                for s in sentences
+                if min_sentence_len <= len(s) <= max_sentence_len  # Long sents are usually metadata.
             ]
+            offset = sentence_offsets[query]
             for idx in range(0, len(sents), self.sliding_distance):
-                passages.append(
+                query_passages_dict[query].append(
                     (
-                        " ".join(sents[idx : idx + self.sentences_per_passage]),
-                        idx,
-                        idx + self.sentences_per_passage - 1,
+                        joiner.join(sents[idx : idx + self.sentences_per_passage]),
+                        offset + idx,
+                        offset + idx + self.sentences_per_passage - 1,
+                        url,
                     )
                 )
-        except UnicodeEncodeError as e:  # Sometimes run into Unicode error when tokenizing.
-            logger.error(f"Unicode error when using Spacy. Skipping text. Error message {e}")
-        return passages
+            sentence_offsets[query] += len(sents)
+        return query_passages_dict
+
+    def _chunk_text(
+        self,
+        text: str,
+        tokenizer=None,
+        min_sentence_len: int = 3,
+        max_sentence_len: int = 250,
+    ) -> list[str]:
+        """Chunks text into passages using a sliding window.
+
+        Args:
+            text: Text to chunk into passages.
+            tokenizer: unused, the configured sentence segmenter is used.
+            max_sentence_len: Maximum number of chars of each sentence before being filtered.
+        Returns:
+            passages: Chunked passages from the text.
+        """
+        passages = self._chunk_pages({"": [[text, None]]}, min_sentence_len, max_sentence_len)[""]
+        return [passage[:3] for passage in passages]
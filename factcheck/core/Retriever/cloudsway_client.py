@@ -1,30 +1,34 @@
+from __future__ import annotations
+
 import json
-import logging
-from typing import Optional, List, Dict, Any, Union
-from typing_extensions import TypeAlias
+import asyncio
+from typing import Optional
 from urllib.parse import quote
 
 import aiohttp
 from tenacity import (
-    retry, 
-    stop_after_attempt, 
-    wait_exponential, 
-    retry_if_exception_type, 
+    retry,
+    stop_after_attempt,
+    wait_exponential,
+    retry_if_exception_type,
     RetryError
 )
+from factcheck.utils.logger import CustomLogger
+
+logger = CustomLogger(__name__).getlog()
 
-# 配置日志
-logger = logging.getLogger(__name__)
 
 # 自定义异常类
 class RateLimitError(Exception):
     """API速率限制异常"""
     pass
 
+
 class RetryableError(Exception):
     """可重试的临时错误"""
     pass
 
+
 class CloudswaySearchClient:
     """
     High-performance async Cloudsway search client with connection pooling.
@@ -38,16 +42,20 @@ class CloudswaySearchClient:
     # Cloudsway API endpoint
     FULLTEXT_URL = "https://searchapi.cloudsway.net/search/NbYyRVhrORhcVYNm/full"
 
-    def __init__(self):
+    def __init__(self, api_key: str, endpoint_url: Optional[str] = None, max_connections: int = 100):
         """
         Initialize Cloudsway search client.
 
-        Required ENV variables:
-        - CLOUDSWAY_API_KEY: API authentication key
+        Args:
+            api_key: Cloudsway API authentication key
+            endpoint_url: fulltext search endpoint, defaults to FULLTEXT_URL
+            max_connections: max total pooled connections
         """
-        self.api_key = "YAJGspbmOFvKPc4qSCsA"
+        self.api_key = api_key
         if not self.api_key:
-            raise ValueError("CLOUDSWAY_API_KEY environment variable is required")
+            raise ValueError("Cloudsway API key is required")
+        self.endpoint_url = endpoint_url or self.FULLTEXT_URL
+        self.max_connections = max_connections
 
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -61,14 +69,14 @@ class CloudswaySearchClient:
         Ensure async HTTP session is initialized.
 
         Creates aiohttp.ClientSession with:
-        - Connection pooling (max 100 connections)
+        - Connection pooling (max_connections connections)
         - Keep-alive for connection reuse
         - 30s timeout for requests
         """
         if self._session is None or self._session.closed:
             # Create connector with connection pooling
             connector = aiohttp.TCPConnector(
-                limit=100,           # Max total connections
+                limit=self.max_connections,  # Max total connections
                 limit_per_host=20,   # Max connections per host
                 ttl_dns_cache=300,   # DNS cache TTL (5 minutes)
             )
@@ -141,21 +149,21 @@ class CloudswaySearchClient:
                 )
                 return result
 
-        except aiohttp.ClientTimeout as e:
+        except asyncio.TimeoutError as e:
             # Timeout - retry
             logger.warning(f"Cloudsway timeout for query: {query}, retrying...")
             raise RetryableError(f"Timeout for query: {query}") from e
 
-        except aiohttp.ClientConnectionError as e:
-            # Connection error - retry
-            logger.warning(f"Cloudsway connection error for query: {query}, retrying...")
-            raise RetryableError(f"Connection error for query: {query}") from e
-
         except aiohttp.ServerDisconnectedError as e:
             # Server disconnected - retry
             logger.warning(f"Cloudsway server disconnected for query: {query}, retrying...")
             raise RetryableError(f"Server disconnected for query: {query}") from e
 
+        except aiohttp.ClientConnectionError as e:
+            # Connection error - retry
+            logger.warning(f"Cloudsway connection error for query: {query}, retrying...")
+            raise RetryableError(f"Connection error for query: {query}") from e
+
     async def search(
         self,
         query: str,
@@ -198,7 +206,7 @@ class CloudswaySearchClient:
             params["sites"] = sites_str
 
         # Always use fulltext endpoint to get mainText (long summary)
-        endpoint_url = self.FULLTEXT_URL
+        endpoint_url = self.endpoint_url
         params["mainText"] = "True"
 
         # Ensure session is initialized
@@ -354,70 +362,3 @@ class CloudswaySearchClient:
             "response_time": None,
             "request_id": None,
         }
-
-
-async def main():
-    """
-    测试 CloudswaySearchClient 的主函数
-    演示如何初始化客户端、执行搜索并处理结果
-    """
-    import asyncio
-    import sys
-    import os
-    
-    # 设置日志级别，便于观察请求过程
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        stream=sys.stdout
-    )
-    
-    # 创建搜索客户端
-    client = CloudswaySearchClient()
-    
-    try:
-        # 测试查询
-        queries = [
-            "中国历史朝代",
-            "人工智能最新发展"
-        ]
-        
-        for query in queries:
-            print(f"\n执行查询: {query}")
-            
-            # 执行搜索
-            results = await client.search(
-                query=query,
-                count=5,  # 限制结果数量
-                include_raw_content=False  # 不包含完整内容
-            )
-            
-            # 打印查询结果
-            print(f"查询: {results['query']}")
-            print(f"结果数量: {len(results['results'])}")
-            
-            # 打印每个结果的标题和URL
-            for i, result in enumerate(results['results'], 1):
-                print(f"\n结果 {i}:")
-                print(f"标题: {result['title']}")
-                print(f"URL: {result['url']}")
-                print(f"内容摘要: {result['content'][:150]}..." if result['content'] else "无内容")
-                
-    except Exception as e:
-        print(f"发生错误: {str(e)}")
-    finally:
-        # 关闭客户端会话
-        await client.close()
-        print("\n客户端会话已关闭")
-
-
-if __name__ == "__main__":
-    import asyncio
-    import sys
-    
-    # 在Windows上需要使用不同的事件循环策略
-    if sys.platform == 'win32':
-        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-    
-    # 运行主函数
-    asyncio.run(main())
\ No newline at end of file
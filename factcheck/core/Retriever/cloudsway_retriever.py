@@ -0,0 +1,133 @@
+import re
+import json
+import asyncio
+
+from factcheck.utils.logger import CustomLogger
+from factcheck.utils.cache import get_search_cache
+from factcheck.utils.singleflight import SingleFlight
+from factcheck.utils.async_util import EventLoopThread
+from .cloudsway_client import CloudswaySearchClient
+from .serper_retriever import normalize_query
+
+logger = CustomLogger(__name__).getlog()
+
+
+class CloudswayEvidenceRetriever:
+    # shared by all retrievers in the process, so identical queries from concurrent requests are searched once
+    single_flight = SingleFlight()
+
+    def __init__(self, llm_client, api_config: dict = None):
+        """Initialize the CloudswayEvidenceRetriever class
+
+        Args:
+            llm_client (BaseClient): kept for token usage bookkeeping, no LLM call is made.
+            api_config (dict): CLOUDSWAY_API_KEY (falls back to SERPER_API_KEY), CLOUDSWAY_API_URL,
+                SERPER_MAX_CONCURRENCY, CLOUDSWAY_INCLUDE_RAW_CONTENT and the search cache settings.
+        """
+        self.api_config = api_config
+        self.llm_client = llm_client
+        self.include_raw_content = bool(api_config.get("CLOUDSWAY_INCLUDE_RAW_CONTENT", False))
+        self.client = CloudswaySearchClient(
+            api_key=api_config.get("CLOUDSWAY_API_KEY") or api_config["SERPER_API_KEY"],
+            endpoint_url=api_config.get("CLOUDSWAY_API_URL"),
+            max_connections=int(api_config.get("SERPER_MAX_CONCURRENCY", 100)),
+        )
+        # the client's pooled session lives on this loop and is reused across requests
+        self._loop_thread = EventLoopThread(name="cloudsway-session-loop")
+
+        # cache of successful search responses, off unless SEARCH_CACHE is set
+        self.search_cache = get_search_cache(api_config)
+
+    def retrieve_evidence(self, claim_queries_dict, top_k: int = 3, snippet_extend_flag: bool = True, timing: dict = None):
+        """Retrieve evidences for the given claims
+
+        Args:
+            claim_queries_dict (dict): a dictionary of claims and their corresponding queries.
+            top_k (int, optional): the number of top relevant results to retrieve. Defaults to 3.
+            snippet_extend_flag (bool, optional): use the full page content (when returned) instead of mainText. Defaults to True.
+            timing (dict, optional): unused, no page is parsed; kept for interface compatibility. Defaults to None.
+
+        Returns:
+            dict: a dictionary of claims and their corresponding evidences.
+        """
+        logger.info("Collecting evidences ...")
+        query_list = [y for x in claim_queries_dict.items() for y in x[1]]
+        responses = self._loop_thread.run(self._search_all(query_list, top_k=top_k))
+
+        evidence_list = []
+        for response in responses:
+            evidences = []
+            for result in response.get("results", [])[:top_k]:
+                text = result.get("content") or ""
+                if snippet_extend_flag and result.get("raw_content"):
+                    text = result["raw_content"]
+                if text and result.get("url"):
+                    evidences.append({"text": re.sub(r"\n+", "\n", text), "url": result["url"]})
+            evidence_list.append(evidences)
+
+        i = 0
+        claim_evidence_dict = {}
+        for claim, queries in claim_queries_dict.items():
+            evidences_per_query_L = evidence_list[i : i + len(queries)]
+            claim_evidence_dict[claim] = [e for evidences in evidences_per_query_L for e in evidences]
+            i += len(queries)
+        assert i == len(evidence_list)
+        logger.info("Collect evidences done!")
+        return claim_evidence_dict
+
+    async def _search_all(self, query_list: list[str], top_k: int = 3) -> list[dict]:
+        return await asyncio.gather(*[self._search(query, top_k=top_k) for query in query_list])
+
+    async def _search(self, query: str, top_k: int = 3) -> dict:
+        """Search a single query through the cache and the single-flight layer."""
+        key = json.dumps(
+            {
+                "url": self.client.endpoint_url,
+                "q": normalize_query(query),
+                "params": {"count": top_k, "include_raw_content": self.include_raw_content},
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        if self.search_cache is not None:
+            cached = self.search_cache.get(key)
+            if cached is not None:
+                return cached
+
+        async def _fetch():
+            response = await self.client.search(query, count=top_k, include_raw_content=self.include_raw_content)
+            # failed searches come back as an empty result, do not cache them
+            if self.search_cache is not None and response.get("results"):
+                self.search_cache.set(key, response)
+            return response
+
+        return await self.single_flight.do_async(key, _fetch)
+
+    def start(self):
+        """Start the background event loop and open the pooled search session. Called lazily on first use."""
+        self._loop_thread.run(self.client._ensure_session())
+        return self
+
+    def close(self):
+        """Close the pooled search session and stop the background event loop."""
+        if self._loop_thread.running:
+            self._loop_thread.stop(cleanup=self.client.close)
+
+    async def __aenter__(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.start)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def get_coalescing_stats(self):
+        return self.single_flight.stats()
+
+    def get_cache_stats(self):
+        return self.search_cache.stats() if self.search_cache is not None else {}
@@ -0,0 +1,65 @@
+import re
+
+from factcheck.utils.logger import CustomLogger
+from factcheck.utils.bm25_index import BM25Index
+
+logger = CustomLogger(__name__).getlog()
+
+
+class LocalEvidenceRetriever:
+    """Search a pre-built BM25 index of a local corpus, without any network access.
+
+    Build the index with `python scripts/build_local_index.py --corpus <corpus> --output <index dir>`.
+    """
+
+    def __init__(self, llm_client, api_config: dict = None):
+        """Initialize the LocalEvidenceRetriever class
+
+        Args:
+            llm_client (BaseClient): kept for token usage bookkeeping, no LLM call is made.
+            api_config (dict): LOCAL_INDEX_PATH, the index directory (defaults to "./cache/local_index").
+        """
+        api_config = api_config or dict()
+        self.llm_client = llm_client
+        self.index = BM25Index(api_config.get("LOCAL_INDEX_PATH", "./cache/local_index"))
+        logger.info(
+            f"Loaded local index with {self.index.meta['num_documents']} documents, "
+            f"{self.index.num_passages} passages."
+        )
+
+    def retrieve_evidence(self, claim_queries_dict, top_k: int = 3, snippet_extend_flag: bool = True, timing: dict = None):
+        """Retrieve evidences for the given claims
+
+        Args:
+            claim_queries_dict (dict): a dictionary of claims and their corresponding queries.
+            top_k (int, optional): the number of top relevant passages per query. Defaults to 3.
+            snippet_extend_flag (bool, optional): append the following passage of the same document. Defaults to True.
+            timing (dict, optional): unused, no page is parsed; kept for interface compatibility. Defaults to None.
+
+        Returns:
+            dict: a dictionary of claims and their corresponding evidences.
+        """
+        logger.info("Collecting evidences ...")
+        query_evidences = {}
+        claim_evidence_dict = {}
+        for claim, queries in claim_queries_dict.items():
+            evidences = []
+            for query in queries:
+                if query not in query_evidences:
+                    query_evidences[query] = self._search(query, top_k=top_k, snippet_extend_flag=snippet_extend_flag)
+                evidences += query_evidences[query]
+            claim_evidence_dict[claim] = evidences
+        logger.info("Collect evidences done!")
+        return claim_evidence_dict
+
+    def _search(self, query: str, top_k: int = 3, snippet_extend_flag: bool = True) -> list[dict]:
+        evidences = []
+        for passage_id, _ in self.index.search(query, top_k=top_k):
+            passage = self.index.get_passage(passage_id)
+            text = passage["text"]
+            if snippet_extend_flag and passage_id + 1 < self.index.num_passages:
+                following = self.index.get_passage(passage_id + 1)
+                if following["doc"] == passage["doc"]:
+                    text = f"{text} {following['text']} ..."
+            evidences.append({"text": re.sub(r"\n+", "\n", text), "url": passage["url"]})
+        return evidences
@@ -1,20 +1,46 @@
-from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 import json
 from urllib.parse import quote
 
 import requests
-import os
 import re
-import bs4
 import asyncio
+import threading
+import unicodedata
 import aiohttp
 from factcheck.utils.logger import CustomLogger
-from factcheck.utils.web_util import crawl_web
+from factcheck.utils.web_util import crawl_web_cached, get_crawler
+from factcheck.utils.html_extractor import get_extractor
+from factcheck.utils.parse_pool import get_parse_pool, extend_snippet_in_text, extract_snippet_window
+from factcheck.utils.singleflight import SingleFlight
+from factcheck.utils.cache import get_page_cache, get_search_cache
+from factcheck.utils.async_util import EventLoopThread
 
 logger = CustomLogger(__name__).getlog()
 
 
+def normalize_query(query: str) -> str:
+    """Normalize a search query so that trivially different spellings share a cache key.
+
+    Args:
+        query (str): the raw query.
+
+    Returns:
+        str: NFKC-normalized, lower-cased query with collapsed whitespace and no trailing punctuation.
+    """
+    query = unicodedata.normalize("NFKC", query).lower()
+    query = re.sub(r"\s+", " ", query).strip()
+    return query.rstrip("?.!。？！ ")
+
+
 class SerperEvidenceRetriever:
+    # shared by all retrievers in the process, so identical queries from concurrent requests are searched once
+    single_flight = SingleFlight()
+    # (search url, api key) -> index of the auth method accepted by the gateway, discovered once per process
+    _auth_method_cache = {}
+    _auth_method_lock = threading.Lock()
+    AUTH_FAILURE_STATUS = (401, 403)
+
     def __init__(self, llm_client, api_config: dict = None):
         """Initialize the SerperEvidenceRetrieve class"""
         # self.lang = "en"
@@ -22,14 +48,39 @@ class SerperEvidenceRetriever:
         self.serper_url = api_config["CLOUDSWAY_API_URL"]
         self.api_config = api_config
         self.llm_client = llm_client
+        # process-wide pooled crawler for fetching result pages
+        self.crawler = get_crawler(api_config)
+        self.extractor = get_extractor(
+            api_config.get("HTML_EXTRACTOR", "auto"),
+            remove_boilerplate=bool(api_config.get("HTML_EXTRACTOR_REMOVE_BOILERPLATE", True)),
+        )
+        # process-wide worker pool for parsing crawled pages, sized by PARSE_POOL_WORKERS
+        self.parse_pool = get_parse_pool(api_config)
+        # process-wide URL -> page text cache, off unless PAGE_CACHE is set
+        self.page_cache = get_page_cache(api_config)
+
+        # long-lived search session, owned by a background event loop shared by all callers of this retriever
+        self._loop_thread = EventLoopThread(name="search-session-loop")
+        self._session: Optional[aiohttp.ClientSession] = None
 
-    def retrieve_evidence(self, claim_queries_dict, top_k: int = 3, snippet_extend_flag: bool = True):
+        # cache of successful search responses, off unless SEARCH_CACHE is set
+        self.search_cache = get_search_cache(api_config)
+
+        # request the long-form mainText and use it instead of crawling pages whose snippet it already covers
+        self.crawl_avoidance = bool(api_config.get("SEARCH_CRAWL_AVOIDANCE", True))
+
+        if api_config.get("SEARCH_AUTH_WARMUP", False):
+            self.warm_up()
+
+    def retrieve_evidence(self, claim_queries_dict, top_k: int = 3, snippet_extend_flag: bool = True, timing: dict = None):
         """Retrieve evidences for the given claims
 
         Args:
             claim_queries_dict (dict): a dictionary of claims and their corresponding queries.
             top_k (int, optional): the number of top relevant results to retrieve. Defaults to 3.
             snippet_extend_flag (bool, optional): whether to extend the snippet. Defaults to True.
+            timing (dict, optional): filled with the "parse_seconds" of this call, per-call so that concurrent
+                requests sharing the retriever do not see each other's. Defaults to None.
 
         Returns:
             dict: a dictionary of claims and their corresponding evidences.
@@ -37,7 +88,7 @@ class SerperEvidenceRetriever:
         logger.info("Collecting evidences ...")
         query_list = [y for x in claim_queries_dict.items() for y in x[1]]
         evidence_list = self._retrieve_evidence_4_all_claim(
-            query_list=query_list, top_k=top_k, snippet_extend_flag=snippet_extend_flag
+            query_list=query_list, top_k=top_k, snippet_extend_flag=snippet_extend_flag, timing=timing
         )
 
         i = 0
@@ -51,7 +102,7 @@ class SerperEvidenceRetriever:
         return claim_evidence_dict
 
     def _retrieve_evidence_4_all_claim(
-            self, query_list: list[str], top_k: int = 3, snippet_extend_flag: bool = True
+            self, query_list: list[str], top_k: int = 3, snippet_extend_flag: bool = True, timing: dict = None
     ) -> list[list[str]]:
         """Retrieve evidences for the given queries
 
@@ -59,6 +110,7 @@ class SerperEvidenceRetriever:
             query_list (list[str]): a list of queries to retrieve evidences for.
             top_k (int, optional): the number of top relevant results to retrieve. Defaults to 3.
             snippet_extend_flag (bool, optional): whether to extend the snippet. Defaults to True.
+            timing (dict, optional): "parse_seconds" is added to. Defaults to None.
 
         Returns:
             list[list[]]: a list of [a list of evidences for each given query].
@@ -82,7 +134,7 @@ class SerperEvidenceRetriever:
         serper_responses = []
         # Prefer async concurrent requests for better throughput
         try:
-            serper_responses = asyncio.run(self._request_serper_api_async(query_list))
+            serper_responses = self._run(self._request_serper_api_async(query_list))
         except Exception as e:
             logger.warning(f"Async serper request failed ({e}), falling back to threaded requests.")
             response = self._request_serper_api(query_list)
@@ -92,12 +144,11 @@ class SerperEvidenceRetriever:
             else:
                 serper_responses.extend(response)
 
-
-         # get the responses for queries
-        query_url_dict = {}
+        # get the responses for queries
         url_to_date = {}  # TODO: decide whether to use date
-        _snippet_to_check = []
-     
+        # results whose snippet will be extended: (query index, query, url, snippet, long-form text from the payload)
+        _results_to_extend = []
+
         for i, (query, response) in enumerate(zip(query_list, serper_responses)):
             # Tavily没有searchParameters字段，直接使用原始查询
             response_query = response.get("query", query)
@@ -118,7 +169,7 @@ class SerperEvidenceRetriever:
                 # 提取 webPages 中的 value 列表
                 web_pages = response.get("webPages", {}).get("value", [])
                 topk_results = web_pages[:top_k]  # Choose top 5 response
-                if (len(_snippet_to_check) == 0) or (not snippet_extend_flag):
+                if (len(_results_to_extend) == 0) or (not snippet_extend_flag):
                     evidences[i] += [
                         {"text": re.sub(r"\n+", "\n", _result["snippet"]), "url": _result["url"]}
                         for _result in topk_results if "snippet" in _result and "url" in _result
@@ -128,82 +179,67 @@ class SerperEvidenceRetriever:
                 for _result in topk_results:
                     if "url" in _result:
                         url_to_date.update({_result["url"]: _result.get("date", "")})
-                        # Save query-url pair, 1 query may have multiple urls
-                        current_urls = query_url_dict.get(query, [])
-                        current_urls.append(_result["url"])
-                        query_url_dict[query] = current_urls
-                        # 收集需要检查的片段
-                        _snippet_to_check.append(_result.get("snippet", ""))
+                        # 收集需要扩展的片段，以及搜索结果中已覆盖该片段的长文本（mainText/content）
+                        snippet = _result.get("snippet", "")
+                        _results_to_extend.append((i, query, _result["url"], snippet, self._payload_text(_result, snippet)))
 
         # return if there is no snippet to check or snippet_extend_flag is False
-        if (len(_snippet_to_check) == 0) or (not snippet_extend_flag):
+        if (len(_results_to_extend) == 0) or (not snippet_extend_flag):
             return evidences
 
-        # crawl web for queries without answer box
-        responses = crawl_web(query_url_dict)
-        # Get extended snippets based on the snippet from serper
-        flag_to_check = [_item[0] for _item in responses]
-        response_to_check = [_item[1] for _item in responses]
-        url_to_check = [_item[2] for _item in responses]
-        query_to_check = [_item[3] for _item in responses]
-
-        def bs4_parse_text(response, snippet, flag):
-            """Parse the text from the response and extend the snippet
-
-            Args:
-                response (web response): the response from the web
-                snippet (str): the snippet to extend from the search result
-                flag (bool): flag to extend the snippet
-
-            Returns:
-                _type_: _description_
-            """
+        # crawl only the urls whose search result does not already cover the snippet
+        query_url_dict = {}
+        url_to_snippet = {}  # (query, url) -> snippet, lets the crawler stop once the snippet context is read
+        for _, query, url, snippet, payload_text in _results_to_extend:
+            if payload_text is None:
+                query_url_dict.setdefault(query, []).append(url)
+                url_to_snippet[(query, url)] = snippet
+        logger.info(f"Snippets covered by search results: {len(_results_to_extend) - len(url_to_snippet)}, to crawl: {len(url_to_snippet)}")
+        # a page cut short after its snippet can not be reused for other snippets, so it is not cached (see
+        # `PageCache.store`), but the early stop is kept: only the pages whose snippet is not found are read whole
+        cached_texts, responses = crawl_web_cached(
+            query_url_dict,
+            crawler=self.crawler,
+            page_cache=self.page_cache,
+            stop_texts=url_to_snippet,
+        ) if query_url_dict else ({}, [])
+        crawled = {(query, url): (flag, response) for flag, response, url, query in responses}
+
+        # snippets covered by the search payload or a cached page are extended in place, crawled pages are parsed
+        # in the persistent worker processes, which receive the raw bytes and send back only the extended window
+        # (and the page text when it is cached)
+        _extended_snippet = [None] * len(_results_to_extend)
+        parse_tasks, parse_indices = [], []
+        for j, (_, query, url, snippet, payload_text) in enumerate(_results_to_extend):
+            text = payload_text if payload_text is not None else cached_texts.get((query, url))
+            if text is not None:
+                _extended_snippet[j] = extend_snippet_in_text(text, snippet)
+                continue
+            flag, response = crawled.get((query, url), (False, None))
             if flag and response and ".pdf" not in str(response.url):
-                try:
-                    soup = bs4.BeautifulSoup(response.text, "html.parser")
-                    text = soup.get_text()
-                    # Search for the snippet in text
-                    snippet_start = text.find(snippet[:-10]) if len(snippet) > 10 else text.find(snippet)
-                    if snippet_start == -1:
-                        return snippet
-                    else:
-                        pre_context_range = 0  # Number of characters around the snippet to display
-                        post_context_range = 500  # Number of characters around the snippet to display
-                        start = max(0, snippet_start - pre_context_range)
-                        end = snippet_start + len(snippet) + post_context_range
-                        return text[start:end] + " ..."
-                except Exception as e:
-                    logger.warning(f"Error parsing web content: {e}")
-                    return snippet
-            else:
-                return snippet
-
-        # Question: if os.cpu_count() cause problems when running in parallel?
-        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-            _extended_snippet = list(
-                executor.map(
-                    lambda _r, _s, _f: bs4_parse_text(_r, _s, _f),
-                    response_to_check,
-                    _snippet_to_check,
-                    flag_to_check,
-                )
-            )
-
-        # merge the snippets by query
-        query_snippet_url_dict = {}
-        for _query, _url, _snippet in zip(query_to_check, url_to_check, _extended_snippet):
-            _snippet_url_list = query_snippet_url_dict.get(_query, [])
-            _snippet_url_list.append((_snippet, _url))
-            query_snippet_url_dict[_query] = _snippet_url_list
+                cacheable = self.page_cache is not None and not response.extensions.get("truncated")
+                parse_tasks.append((response.content, response.encoding, snippet, self.extractor, cacheable))
+                parse_indices.append(j)
+
+        # the pool is shared by concurrent requests, so time only this request's tasks, not its global counter
+        windows, parse_seconds = self.parse_pool.map_timed(extract_snippet_window, parse_tasks)
+        if timing is not None:
+            timing["parse_seconds"] = timing.get("parse_seconds", 0.0) + parse_seconds
+        for j, (window, text) in zip(parse_indices, windows):
+            _extended_snippet[j] = window
+            if self.page_cache is not None:
+                _, query, url, _, _ = _results_to_extend[j]
+                self.page_cache.store(url, text, crawled[(query, url)][1])
+        logger.info(f"Parsed {len(parse_tasks)} crawled pages in {parse_seconds:.3f}s of worker time.")
+
+        # fall back to the snippet itself if it can not be extended
+        _extended_snippet = [
+            window or snippet for window, (_, _, _, snippet, _) in zip(_extended_snippet, _results_to_extend)
+        ]
 
         # extend the evidence list for each query
-        for _query in query_snippet_url_dict.keys():
-            if _query in query_list:  # 确保查询存在
-                _query_index = query_list.index(_query)
-                _snippet_url_list = query_snippet_url_dict[_query]
-                evidences[_query_index] += [
-                    {"text": re.sub(r"\n+", "\n", snippet), "url": _url} for snippet, _url in _snippet_url_list
-                ]
+        for (_query_index, _, _url, _, _), snippet in zip(_results_to_extend, _extended_snippet):
+            evidences[_query_index].append({"text": re.sub(r"\n+", "\n", snippet), "url": _url})
 
         return evidences
 
@@ -272,59 +308,55 @@ class SerperEvidenceRetriever:
                 "mainText": "true",  # 设置为true表示只查询核心内容，不查询全文
                 "num": "3"  # 限制每个查询只返回3个证据
             }
-
-            # 尝试不同的认证方法
-            auth_methods = [
-                # 方法1: Bearer 认证
-                {"headers": {"Authorization": f"Bearer {self.serper_key}"}},
-                # 方法2: API Key 认证
-                {"headers": {"X-API-KEY": self.serper_key}},
-                # 方法3: 自定义 API-Key 头
-                {"headers": {"API-Key": self.serper_key}},
-                # 方法4: 自定义 apikey 头
-                {"headers": {"apikey": self.serper_key}},
-                # 方法5: URL 参数认证
-                {"params": {"api_key": self.serper_key}},
-            ]
-
-            success = False
+            # 先查缓存；相同的查询正在进行中时，等待其结果而不是重复请求
+            key = self._search_key(url, question, params)
+            cached = self._get_cached_response(key)
+            if cached is not None:
+                return cached
+            return self.single_flight.do(key, _fetch_single_question, question, params, key)
+
+        def _fetch_single_question(question, params, key):
+            # 优先使用已确认可用的认证方法，只有在 401/403 时才重新探测
+            known_method = self._get_auth_method(url)
             last_error = None
-            
-            for auth_method in auth_methods:
+
+            for method_index in self._auth_probe_order(known_method):
+                auth_method = self._auth_methods()[method_index]
                 try:
-                    # 合并认证参数
-                    request_params = params.copy()
-                    if "params" in auth_method:
-                        request_params.update(auth_method["params"])
-                    
-                    # 合并头信息
-                    headers = {"Content-Type": "application/json"}
-                    if "headers" in auth_method:
-                        headers.update(auth_method["headers"])
-                    
+                    # 合并认证参数与头信息
+                    request_params, headers = self._apply_auth_method(auth_method, params)
+
                     # 发送请求
-                    logger.info(f"尝试使用认证方法: {auth_method} 查询问题: {question}")
+                    logger.info(f"使用认证方法 {method_index} 查询问题: {question}")
                     response = requests.get(
-                        url, 
+                        url,
                         params=request_params,
                         headers=headers,
                         timeout=10
                     )
-                    
+
                     # 处理响应
                     if response.status_code == 200:
                         logger.info(f"搜索成功，状态码: {response.status_code}，问题: {question}")
-                        return response.json()
-                    else:
-                        logger.warning(f"搜索失败，状态码: {response.status_code}，问题: {question}")
-                        last_error = f"HTTP错误: {response.status_code}"
+                        self._set_auth_method(url, method_index)
+                        data = response.json()
+                        self._cache_response(key, data)
+                        return data
+                    logger.warning(f"搜索失败，状态码: {response.status_code}，问题: {question}")
+                    last_error = f"HTTP错误: {response.status_code}"
+                    if method_index == known_method:
+                        if response.status_code not in self.AUTH_FAILURE_STATUS:
+                            break
+                        self._forget_auth_method(url)
                 except Exception as e:
                     logger.error(f"请求异常: {str(e)}，问题: {question}")
                     last_error = str(e)
-            
-            logger.error(f"所有认证方法都失败，问题: '{question}'，最后错误: {last_error}")
-            return {"error": f"所有认证方法都失败，问题: '{question}'，最后错误: {last_error}"}
-        
+                    if method_index == known_method:
+                        break
+
+            logger.error(f"搜索失败，问题: '{question}'，最后错误: {last_error}")
+            return {"error": f"搜索失败，问题: '{question}'，最后错误: {last_error}"}
+
         # 使用线程池并发请求所有问题（退路实现）
         max_workers = min(len(questions), int(self.api_config.get("SERPER_MAX_CONCURRENCY", 56))) if self.api_config else min(len(questions), 56)
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
@@ -332,70 +364,220 @@ class SerperEvidenceRetriever:
         
         return responses
 
-    async def _request_serper_api_async(self, questions):
-        """Request the serper/cloudsway API concurrently using aiohttp.
+    async def _request_serper_api_async(self, questions, use_cache: bool = True):
+        """Request the serper/cloudsway API concurrently using the retriever's pooled aiohttp session.
+
+        Must run on the retriever's event loop, see `_run`.
 
         Args:
             questions (list[str]): list of queries to request.
+            use_cache (bool, optional): serve the queries from the search cache when they are in it. Defaults to True.
 
         Returns:
             list[dict]: list of JSON responses corresponding to questions.
         """
         url = self.serper_url or "https://searchapi.cloudsway.net/search/NbYyRVhrORhcVYNm/full"
-        max_concurrency = int(self.api_config.get("SERPER_MAX_CONCURRENCY", 56)) if self.api_config else 56
-
-        connector = aiohttp.TCPConnector(limit=max_concurrency)
-        timeout = aiohttp.ClientTimeout(total=15)
-
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            async def fetch_single_question(question: str):
-                # URL encode the query param
-                encoded_question = quote(question)
-                request_params = {
-                    "q": encoded_question,
-                    "gl": "us",
-                    "hl": "en",
-                    "autocorrect": "true",
-                }
-
-                # Try a set of auth methods to be tolerant of API gateway configuration
-                auth_methods = [
-                    {},
-                    {"headers": {"Authorization": f"Bearer {self.serper_key}"}},
-                    {"headers": {"X-API-KEY": self.serper_key}},
-                    {"headers": {"API-Key": self.serper_key}},
-                    {"headers": {"apikey": self.serper_key}},
-                    {"params": {"api_key": self.serper_key}},
-                ]
+        session = await self._ensure_session()
+
+        async def fetch_single_question(question: str):
+            # URL encode the query param
+            encoded_question = quote(question)
+            request_params = {
+                "q": encoded_question,
+                "gl": "us",
+                "hl": "en",
+                "autocorrect": "true",
+            }
+            if self.crawl_avoidance:
+                request_params["mainText"] = "true"
+            # Serve from cache, or await an identical in-flight query instead of sending it again
+            key = self._search_key(url, question, request_params)
+            cached = self._get_cached_response(key) if use_cache else None
+            if cached is not None:
+                return cached
+            return await self.single_flight.do_async(key, _fetch_single_question, question, request_params, key)
+
+        async def _fetch_single_question(question: str, request_params: dict, key: str):
+            # Use the auth method that worked before, re-probe all of them only on 401/403
+            known_method = self._get_auth_method(url)
+            last_error = None
+
+            for method_index in self._auth_probe_order(known_method):
+                auth_method = self._auth_methods()[method_index]
+                try:
+                    params, headers = self._apply_auth_method(auth_method, request_params)
+
+                    async with session.get(url, params=params, headers=headers) as resp:
+                        if resp.status == 200:
+                            self._set_auth_method(url, method_index)
+                            data = await resp.json()
+                            self._cache_response(key, data)
+                            return data
+                        last_error = f"HTTP {resp.status}"
+                        if method_index == known_method:
+                            if resp.status not in self.AUTH_FAILURE_STATUS:
+                                break
+                            self._forget_auth_method(url)
+                except Exception as e:
+                    last_error = str(e)
+                    logger.error(f"请求异常: {e}，问题: {question}")
+                    if method_index == known_method:
+                        break
+
+            logger.error(f"搜索失败，问题: '{question}'，最后错误: {last_error}")
+            return {"error": f"搜索失败，问题: '{question}'，最后错误: {last_error}"}
+
+        tasks = [fetch_single_question(q) for q in questions]
+        return await asyncio.gather(*tasks)
+
+    def _auth_methods(self) -> list[dict]:
+        """Candidate auth methods, tried in this order until the gateway accepts one."""
+        return [
+            {},
+            {"headers": {"Authorization": f"Bearer {self.serper_key}"}},
+            {"headers": {"X-API-KEY": self.serper_key}},
+            {"headers": {"API-Key": self.serper_key}},
+            {"headers": {"apikey": self.serper_key}},
+            {"params": {"api_key": self.serper_key}},
+        ]
+
+    def _apply_auth_method(self, auth_method: dict, params: dict):
+        """Merge the auth method into a copy of the request params and the default headers."""
+        request_params = params.copy()
+        request_params.update(auth_method.get("params", {}))
+        headers = {"Content-Type": "application/json"}
+        headers.update(auth_method.get("headers", {}))
+        return request_params, headers
+
+    def _auth_probe_order(self, known_method: int = None) -> list[int]:
+        """The known auth method first, followed by the others in case it is rejected with 401/403."""
+        order = list(range(len(self._auth_methods())))
+        if known_method is not None:
+            order.remove(known_method)
+            order.insert(0, known_method)
+        return order
+
+    def _get_auth_method(self, url: str):
+        with self._auth_method_lock:
+            return self._auth_method_cache.get((url, self.serper_key))
+
+    def _set_auth_method(self, url: str, method_index: int):
+        with self._auth_method_lock:
+            if self._auth_method_cache.get((url, self.serper_key)) != method_index:
+                logger.info(f"Search auth method {method_index} accepted by {url}")
+            self._auth_method_cache[(url, self.serper_key)] = method_index
+
+    def _forget_auth_method(self, url: str):
+        with self._auth_method_lock:
+            self._auth_method_cache.pop((url, self.serper_key), None)
+        logger.warning(f"Search auth method rejected by {url}, re-probing.")
+
+    def start(self):
+        """Start the background event loop and open the pooled search session. Called lazily on first use."""
+        self._loop_thread.run(self._ensure_session())
+        return self
+
+    async def _ensure_session(self) -> aiohttp.ClientSession:
+        """Ensure the pooled search session is open.
+
+        Creates aiohttp.ClientSession with:
+        - Connection pooling (SERPER_MAX_CONCURRENCY connections, SERPER_MAX_CONNECTIONS_PER_HOST per host)
+        - Keep-alive for connection reuse
+        - DNS cache (5 minutes)
+        - 15s timeout for requests
+        """
+        if self._session is None or self._session.closed:
+            max_concurrency = int(self.api_config.get("SERPER_MAX_CONCURRENCY", 56))
+            connector = aiohttp.TCPConnector(
+                limit=max_concurrency,
+                limit_per_host=int(self.api_config.get("SERPER_MAX_CONNECTIONS_PER_HOST", max_concurrency)),
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+            )
+            timeout = aiohttp.ClientTimeout(total=15)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            logger.info("Initialized pooled search session.")
+        return self._session
+
+    def _run(self, coro):
+        """Run a coroutine on the retriever's event loop from synchronous code and wait for the result."""
+        return self._loop_thread.run(coro)
 
-                last_error = None
-                for auth_method in auth_methods:
-                    try:
-                        # Merge auth params
-                        params = request_params.copy()
-                        if "params" in auth_method:
-                            params.update(auth_method["params"])
-
-                        headers = {"Content-Type": "application/json"}
-                        if "headers" in auth_method:
-                            headers.update(auth_method["headers"])
-
-                        async with session.get(url, params=params, headers=headers) as resp:
-                            if resp.status == 200 :
-                                return await resp.json()
-                            else:
-                                last_error = f"HTTP {resp.status}"
-                                # logger.warning(f"搜索失败，状态码: {resp.status}，问题: {question}")
-                    except Exception as e:
-                        last_error = str(e)
-                        logger.error(f"请求异常: {e}，问题: {question}")
-
-                logger.error(f"所有认证方法都失败，问题: '{question}'，最后错误: {last_error}")
-                return {"error": f"所有认证方法都失败，问题: '{question}'，最后错误: {last_error}"}
-
-            tasks = [fetch_single_question(q) for q in questions]
-            return await asyncio.gather(*tasks)
-      
+    async def _close_session(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def close(self):
+        """Close the pooled search session and stop the background event loop."""
+        if self._loop_thread.running:
+            self._loop_thread.stop(cleanup=self._close_session)
+            logger.info("Closed pooled search session.")
+
+    async def __aenter__(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.start)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def warm_up(self, probe_query: str = "test"):
+        """Discover the working auth method before the first request by sending one probe query.
+
+        The probe bypasses the search cache, a cached response would not reach the gateway and leave the auth
+        method unknown.
+
+        Args:
+            probe_query (str, optional): the query used for probing. Defaults to "test".
+        """
+        response = self._run(self._request_serper_api_async([probe_query], use_cache=False))[0]
+        if "error" in response:
+            logger.warning(f"Search auth warm-up failed: {response['error']}")
+
+    def _payload_text(self, result: dict, snippet: str):
+        """Return the long-form text of a search result (full content, then mainText) that covers the snippet.
+
+        Such results are extended from the search payload itself instead of crawling their page.
+        """
+        if not self.crawl_avoidance:
+            return None
+        for field in ["content", "mainText"]:
+            text = result.get(field)
+            if isinstance(text, str) and text and extend_snippet_in_text(text, snippet) is not None:
+                return text
+        return None
+
+    def _search_key(self, url: str, question: str, params: dict) -> str:
+        """Build the cache and single-flight key from the normalized query and the other request parameters."""
+        params = {k: v for k, v in params.items() if k != "q"}
+        return json.dumps({"url": url, "q": normalize_query(question), "params": params}, sort_keys=True, ensure_ascii=False)
+
+    def _get_cached_response(self, key: str):
+        if self.search_cache is None:
+            return None
+        return self.search_cache.get(key)
+
+    def _cache_response(self, key: str, response: dict):
+        if self.search_cache is not None and isinstance(response, dict) and "error" not in response:
+            self.search_cache.set(key, response)
+
+    def get_coalescing_stats(self):
+        return self.single_flight.stats()
+
+    def get_cache_stats(self):
+        return self.search_cache.stats() if self.search_cache is not None else {}
+
+    def get_parse_stats(self):
+        return self.parse_pool.stats()
+
+    def get_page_cache_stats(self):
+        return self.page_cache.stats() if self.page_cache is not None else {}
 
 
 if __name__ == "__main__":
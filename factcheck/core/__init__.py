@@ -2,4 +2,7 @@ from .Decompose import Decompose
 from .CheckWorthy import Checkworthy
 from .QueryGenerator import QueryGenerator
 from .Retriever import retriever_mapper
-from .ClaimVerify import ClaimVerify
+from .ClaimVerify import ClaimVerify, NLIClaimVerify
+from .EvidenceRerank import EvidenceReranker
+from .EvidenceDedup import EvidenceDeduplicator
+from .QueryBudget import QueryBudget
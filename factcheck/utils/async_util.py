@@ -0,0 +1,51 @@
+import asyncio
+import threading
+from typing import Optional
+
+
+class EventLoopThread:
+    """An asyncio event loop running forever in a daemon thread.
+
+    Objects bound to a loop (e.g. `aiohttp.ClientSession`) can live on it across many synchronous calls coming
+    from different threads, instead of being rebuilt by every `asyncio.run`.
+    """
+
+    def __init__(self, name: str = "factcheck-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """Start the loop thread if needed and return the loop."""
+        with self._lock:
+            if not self.running:
+                loop = asyncio.new_event_loop()
+                started = threading.Event()
+                loop.call_soon(started.set)
+                self._thread = threading.Thread(target=loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+                started.wait()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro):
+        """Run a coroutine on the loop from synchronous code and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.start()).result()
+
+    def stop(self, cleanup=None):
+        """Stop the loop thread, awaiting the optional `cleanup()` coroutine on the loop first."""
+        with self._lock:
+            if not self.running:
+                return
+            if cleanup is not None:
+                asyncio.run_coroutine_threadsafe(cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
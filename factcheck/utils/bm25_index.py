@@ -0,0 +1,184 @@
+import os
+import json
+import math
+import mmap
+from array import array
+from typing import Iterable
+
+import numpy as np
+
+from factcheck.utils.utils import TOKEN_PATTERN, TOKENIZER_VERSION, tokenize
+from factcheck.utils.logger import CustomLogger
+
+logger = CustomLogger(__name__).getlog()
+
+POSTING_DTYPE = np.dtype([("passage", "<u4"), ("tf", "<u4")])
+
+
+def split_passages(text: str, passage_tokens: int = 128):
+    """Split a document into consecutive passages of at most `passage_tokens` tokens.
+
+    A passage runs from its first token to the first token of the next one, so punctuation is kept.
+    """
+    starts = [m.start() for m in TOKEN_PATTERN.finditer(text)]
+    for i in range(0, len(starts), passage_tokens):
+        end = starts[i + passage_tokens] if i + passage_tokens < len(starts) else len(text)
+        yield text[starts[i] : end].strip()
+
+
+class BM25Index:
+    """On-disk BM25 inverted index over the passages of a local corpus.
+
+    An index directory holds:
+        meta.json              corpus statistics, BM25 parameters and the tokenizer the index was built with
+        vocab.json             term -> [first posting, document frequency]
+        postings.npy           (passage id, term frequency) records sorted by term, memory-mapped
+        passage_lengths.npy    number of tokens of every passage, memory-mapped
+        passages.jsonl         {"text", "url", "doc"} of every passage, read through mmap at `passage_offsets.npy`
+
+    Only the vocabulary is loaded in memory; postings and passages are paged in by the OS on access.
+    """
+
+    def __init__(self, index_dir: str):
+        """Open an index built by `BM25Index.build`
+
+        Args:
+            index_dir (str): the index directory.
+
+        Raises:
+            ValueError: the index was built with another tokenizer, its terms would not match the queries' tokens.
+        """
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        # indexes built before the tokenizer was recorded used version 1 (CJK runs glued to words)
+        tokenizer = self.meta.get("tokenizer", {"version": 1})
+        if tokenizer.get("version") != TOKENIZER_VERSION or tokenizer.get("pattern") != TOKEN_PATTERN.pattern:
+            raise ValueError(
+                f"The index {index_dir} was built with tokenizer version {tokenizer.get('version')}, the current "
+                f"one is {TOKENIZER_VERSION}. Rebuild it with scripts/build_local_index.py."
+            )
+        with open(os.path.join(index_dir, "vocab.json"), encoding="utf-8") as f:
+            self.vocab = json.load(f)
+        self.k1 = self.meta["k1"]
+        self.b = self.meta["b"]
+        self.num_passages = self.meta["num_passages"]
+        self.avg_length = self.meta["avg_length"]
+        self.postings = np.load(os.path.join(index_dir, "postings.npy"), mmap_mode="r")
+        self.passage_lengths = np.load(os.path.join(index_dir, "passage_lengths.npy"), mmap_mode="r")
+        self.passage_offsets = np.load(os.path.join(index_dir, "passage_offsets.npy"), mmap_mode="r")
+        self._passage_file = open(os.path.join(index_dir, "passages.jsonl"), "rb")
+        self._passages = mmap.mmap(self._passage_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def build(
+        documents: Iterable[dict],
+        index_dir: str,
+        passage_tokens: int = 128,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> dict:
+        """Build an index from {"text", "url"} documents.
+
+        Postings are accumulated as compact arrays and sorted once at the end, so the build needs roughly
+        12 bytes of memory per (term, passage) pair.
+
+        Args:
+            documents (Iterable[dict]): documents with a "text" and an "url" (or any source identifier).
+            index_dir (str): the output directory.
+            passage_tokens (int, optional): maximum number of tokens per passage. Defaults to 128.
+            k1 (float, optional): BM25 term frequency saturation. Defaults to 1.5.
+            b (float, optional): BM25 length normalization. Defaults to 0.75.
+
+        Returns:
+            dict: the index statistics written to meta.json.
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        term_ids = {}
+        posting_terms, posting_passages, posting_tfs = array("I"), array("I"), array("I")
+        passage_lengths, passage_offsets = array("I"), array("Q")
+
+        num_docs = 0
+        with open(os.path.join(index_dir, "passages.jsonl"), "wb") as passage_file:
+            for doc_id, document in enumerate(documents):
+                num_docs += 1
+                for text in split_passages(document.get("text") or "", passage_tokens=passage_tokens):
+                    passage_id = len(passage_lengths)
+                    tokens = tokenize(text)
+                    counts = {}
+                    for token in tokens:
+                        counts[token] = counts.get(token, 0) + 1
+                    for token, tf in counts.items():
+                        posting_terms.append(term_ids.setdefault(token, len(term_ids)))
+                        posting_passages.append(passage_id)
+                        posting_tfs.append(tf)
+                    passage_lengths.append(len(tokens))
+                    passage_offsets.append(passage_file.tell())
+                    record = {"text": text, "url": document.get("url", ""), "doc": doc_id}
+                    passage_file.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                if num_docs % 10000 == 0:
+                    logger.info(f"Indexed {num_docs} documents, {len(passage_lengths)} passages.")
+
+        terms = np.frombuffer(posting_terms, dtype=np.uint32)
+        order = np.argsort(terms, kind="stable")
+        postings = np.empty(len(terms), dtype=POSTING_DTYPE)
+        postings["passage"] = np.frombuffer(posting_passages, dtype=np.uint32)[order]
+        postings["tf"] = np.frombuffer(posting_tfs, dtype=np.uint32)[order]
+        np.save(os.path.join(index_dir, "postings.npy"), postings)
+
+        dfs = np.bincount(terms, minlength=len(term_ids))
+        starts = np.concatenate([[0], np.cumsum(dfs)[:-1]]) if len(dfs) else dfs
+        vocab = {term: [int(starts[i]), int(dfs[i])] for term, i in term_ids.items()}
+        with open(os.path.join(index_dir, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(vocab, f, ensure_ascii=False)
+
+        lengths = np.frombuffer(passage_lengths, dtype=np.uint32)
+        np.save(os.path.join(index_dir, "passage_lengths.npy"), lengths)
+        np.save(os.path.join(index_dir, "passage_offsets.npy"), np.frombuffer(passage_offsets, dtype=np.uint64))
+
+        meta = {
+            "num_documents": num_docs,
+            "num_passages": len(lengths),
+            "num_terms": len(term_ids),
+            "avg_length": float(lengths.mean()) if len(lengths) else 0.0,
+            "passage_tokens": passage_tokens,
+            "k1": k1,
+            "b": b,
+            "tokenizer": {"version": TOKENIZER_VERSION, "pattern": TOKEN_PATTERN.pattern},
+        }
+        with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        return meta
+
+    def search(self, query: str, top_k: int = 3) -> list[tuple[int, float]]:
+        """Return the (passage id, BM25 score) of the best passages for the query."""
+        passage_ids, contributions = [], []
+        for term in set(tokenize(query)):
+            if term not in self.vocab:
+                continue
+            start, df = self.vocab[term]
+            postings = self.postings[start : start + df]
+            ids = postings["passage"]
+            tf = postings["tf"].astype(np.float32)
+            idf = math.log(1 + (self.num_passages - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.passage_lengths[ids] / max(self.avg_length, 1e-9))
+            passage_ids.append(ids)
+            contributions.append(idf * tf * (self.k1 + 1) / (tf + norm))
+        if not passage_ids:
+            return []
+
+        candidates, inverse = np.unique(np.concatenate(passage_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
+        top = np.argsort(-scores)[:top_k] if len(scores) <= top_k else np.argpartition(-scores, top_k)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def get_passage(self, passage_id: int) -> dict:
+        """Return the {"text", "url", "doc"} record of a passage."""
+        start = int(self.passage_offsets[passage_id])
+        end = self._passages.find(b"\n", start)
+        return json.loads(self._passages[start:end].decode("utf-8"))
+
+    def close(self):
+        self._passages.close()
+        self._passage_file.close()
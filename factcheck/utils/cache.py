@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from factcheck.utils.logger import CustomLogger
+
+logger = CustomLogger(__name__).getlog()
+
+
+class DiskCache:
+    """Thread-safe JSON key-value cache with a TTL, persisted in a SQLite file.
+
+    Entries older than `ttl` seconds are treated as missing. When `max_bytes` is set, the least recently used
+    entries are evicted once the total size of the stored values exceeds it, down to 90% of it so that eviction
+    does not run again on the next write. The total is kept as a running count, not summed on every write.
+    """
+
+    EVICT_TO_RATIO = 0.9
+
+    def __init__(self, path: str = None, ttl: float = 86400, max_bytes: int = None):
+        """Initialize the DiskCache class
+
+        Args:
+            path (str, optional): path of the SQLite file, in-memory only if None. Defaults to None.
+            ttl (float, optional): seconds before an entry expires, never expires if None. Defaults to 86400.
+            max_bytes (int, optional): total size of stored values before LRU eviction, unbounded if None. Defaults to None.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path is not None and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT, created_at REAL, accessed_at REAL, size INTEGER)"
+        )
+        self._conn.commit()
+        self._total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def _is_fresh(self, created_at: float) -> bool:
+        return self.ttl is None or time.time() - created_at <= self.ttl
+
+    def get(self, key: str, default=None):
+        """Return the cached value for the key, or `default` if it is missing or expired."""
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or not self._is_fresh(row[1]):
+                self.misses += 1
+                return default
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def get_entry(self, key: str):
+        """Return (value, age in seconds) for the key even if it is expired, or None if it is missing."""
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0]), time.time() - row[1]
+
+    def set(self, key: str, value):
+        """Store a JSON-serializable value under the key."""
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._total_size -= self._stored_size(key)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at, size) VALUES (?, ?, ?, ?, ?)",
+                (key, data, now, now, len(data)),
+            )
+            self._total_size += len(data)
+            if self.max_bytes is not None and self._total_size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._total_size -= self._stored_size(key)
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def _stored_size(self, key: str) -> int:
+        row = self._conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones until the cache fits in 90% of max_bytes."""
+        if self.ttl is not None:
+            expired_before = time.time() - self.ttl
+            expired_size = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM cache WHERE created_at < ?", (expired_before,)
+            ).fetchone()[0]
+            self._conn.execute("DELETE FROM cache WHERE created_at < ?", (expired_before,))
+            self._total_size -= expired_size
+        target = self.max_bytes * self.EVICT_TO_RATIO
+        if self._total_size <= target:
+            return
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+            if self._total_size <= target:
+                break
+            evicted.append((key,))
+            self._total_size -= size
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", evicted)
+        logger.info(f"Cache {self.path}: evicted {len(evicted)} entries.")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class PageCache:
+    """Disk-backed cache of URL -> extracted page text, revalidated with conditional GETs.
+
+    Entries younger than `freshness` seconds are served as-is. Older entries keep their ETag/Last-Modified
+    validators, so the page is downloaded again only if it changed (the server answers 304 otherwise). Entries
+    never expire on their own; the least recently used ones are evicted once the cache exceeds `max_bytes`.
+    """
+
+    def __init__(self, path: str = None, freshness: float = 3600, max_bytes: int = 256 * 1024 * 1024):
+        """Initialize the PageCache class
+
+        Args:
+            path (str, optional): path of the SQLite file, in-memory only if None. Defaults to None.
+            freshness (float, optional): seconds an entry is served without revalidation. Defaults to 3600.
+            max_bytes (int, optional): total size of the cached texts before LRU eviction. Defaults to 256MB.
+        """
+        self.freshness = freshness
+        self.cache = DiskCache(path=path, ttl=None, max_bytes=max_bytes)
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, url: str):
+        """Return (entry, fresh) for the url, entry is None if the page is not cached."""
+        found = self.cache.get_entry(url)
+        if found is None:
+            with self._lock:
+                self.misses += 1
+            return None, False
+        entry, age = found
+        fresh = age <= self.freshness
+        if fresh:
+            with self._lock:
+                self.fresh_hits += 1
+        return entry, fresh
+
+    @staticmethod
+    def conditional_headers(entry: dict) -> dict:
+        """Build the If-None-Match/If-Modified-Since headers to revalidate a cached entry."""
+        validators = {}
+        if entry.get("etag"):
+            validators["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            validators["If-Modified-Since"] = entry["last_modified"]
+        return validators
+
+    def store(self, url: str, text: str, response):
+        """Cache the extracted text of a crawled page with the validators of its response.
+
+        Pages whose download was cut short on purpose (see `WebCrawler.get`) are not cached.
+        """
+        if not text or response.extensions.get("truncated"):
+            return
+        entry = {
+            "text": text,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+        }
+        self.cache.set(url, entry)
+
+    def refresh(self, url: str, entry: dict, response=None):
+        """Restart the freshness window of an entry the server reported as not modified."""
+        if response is not None:
+            entry = dict(entry)
+            entry["etag"] = response.headers.get("etag") or entry.get("etag")
+            entry["last_modified"] = response.headers.get("last-modified") or entry.get("last_modified")
+        self.cache.set(url, entry)
+        with self._lock:
+            self.revalidated += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {"fresh_hits": self.fresh_hits, "revalidated": self.revalidated, "misses": self.misses}
+        stats["entries"] = self.cache.stats()["entries"]
+        return stats
+
+    def close(self):
+        self.cache.close()
+
+
+_shared_page_cache = None
+_shared_page_cache_lock = threading.Lock()
+
+
+def get_search_cache(api_config: dict = None):
+    """Return a search response cache built from the SEARCH_CACHE_* config keys, None if SEARCH_CACHE is off.
+
+    Off by default: a cached response is served for SEARCH_CACHE_TTL seconds (default 1 day), so breaking news
+    searched again within that time does not show up, and the SQLite file is written under SEARCH_CACHE_PATH.
+    """
+    api_config = api_config or dict()
+    cache_ttl = float(api_config.get("SEARCH_CACHE_TTL", 86400))
+    if not api_config.get("SEARCH_CACHE", False) or cache_ttl <= 0:
+        return None
+    return DiskCache(path=api_config.get("SEARCH_CACHE_PATH", "./cache/search_cache.sqlite"), ttl=cache_ttl)
+
+
+def get_page_cache(api_config: dict = None):
+    """Return the process-wide page cache built from the PAGE_CACHE_* config keys, None if PAGE_CACHE is off.
+
+    Off by default: a cached page is served without revalidation for PAGE_CACHE_FRESHNESS seconds (default 1 hour),
+    so an edited page can be read stale for that long, and the SQLite file is written under PAGE_CACHE_PATH.
+    """
+    global _shared_page_cache
+    api_config = api_config or dict()
+    max_bytes = int(api_config.get("PAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+    if not api_config.get("PAGE_CACHE", False) or max_bytes <= 0:
+        return None
+    with _shared_page_cache_lock:
+        if _shared_page_cache is None:
+            _shared_page_cache = PageCache(
+                path=api_config.get("PAGE_CACHE_PATH", "./cache/page_cache.sqlite"),
+                freshness=float(api_config.get("PAGE_CACHE_FRESHNESS", 3600)),
+                max_bytes=max_bytes,
+            )
+        return _shared_page_cache
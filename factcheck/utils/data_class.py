@@ -27,9 +27,16 @@ class Evidence:
     url: str = None
     reasoning: str = None
     relationship: str = None
+    rerank_score: Optional[float] = None  # set when evidences are reranked or scored by progressive retrieval
+    merged_urls: Optional[List[str]] = None  # urls of the duplicates collapsed into this evidence
+
+    # fields that may stay None in a complete evidence
+    _optional_fields = ("rerank_score", "merged_urls")
 
     def attribute_check(self) -> bool:
         for field in self.__dataclass_fields__.values():
+            if field.name in self._optional_fields:
+                continue
             if getattr(self, field.name) is None:
                 print(f"Field {field.name} is None")
                 return False
@@ -51,7 +58,11 @@ class ClaimDetail:
         queries (List[str]): The list of queries generated for the claim. [create from query_generator]
         evidences (List[Evidence]): The list of evidences retrieved for the claim. [createfrom evidence_crawler]
         factuality (any): The factuality of the claim. [create by summarize evidences]
-            possible values: "Nothing to check.", "No evidence found", float in [0, 1]
+            possible values: "Nothing to check.", "No evidence found", "Skipped by budget.", float in [0, 1]
+        cache_hit (dict): The cached verification reused for the claim, with the verified wording, the similarity
+            and the time it was cached; None if the claim was verified. [create from verdict cache]
+        budget_skipped (dict): The queries and the urls of the evidences left out by the document budget, and whether
+            the query generation was skipped; None if nothing was skipped. [create from query budget]
     """
 
     id: int = None
@@ -64,9 +75,16 @@ class ClaimDetail:
     queries: List[str] = None
     evidences: List[dict] = None
     factuality: any = None
+    cache_hit: Optional[dict] = None
+    budget_skipped: Optional[dict] = None
+
+    # fields that may stay None in a complete claim detail
+    _optional_fields = ("cache_hit", "budget_skipped")
 
     def attribute_check(self) -> bool:
         for field in self.__dataclass_fields__.values():
+            if field.name in self._optional_fields:
+                continue
             if getattr(self, field.name) is None:
                 print(f"Field {field.name} is None")
                 return False
@@ -114,9 +132,15 @@ class FactCheckOutput:
     usage: PipelineUsage = None
     claim_detail: List[ClaimDetail] = None
     summary: FCSummary = None
+    budget: Optional[dict] = None  # limits and spending of the document budget, set only when one is configured
+
+    # fields that may stay None in a complete output
+    _optional_fields = ("budget",)
 
     def attribute_check(self) -> bool:
         for field in self.__dataclass_fields__.values():
+            if field.name in self._optional_fields:
+                continue
             if getattr(self, field.name) is None:
                 print(f"Field {field.name} is None")
                 return False
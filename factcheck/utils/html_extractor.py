@@ -0,0 +1,149 @@
+import importlib.util
+
+import bs4
+
+from factcheck.utils.logger import CustomLogger
+
+logger = CustomLogger(__name__).getlog()
+
+# tags whose text is never visible
+INVISIBLE_TAGS = ["style", "script", "head", "title", "meta", "noscript", "template"]
+# page chrome that rarely carries evidence; not "form", ASP.NET WebForms pages wrap the whole body in one, nor
+# "header", some themes put the article lede in it
+BOILERPLATE_TAGS = ["nav", "footer", "aside", "iframe", "svg", "button", "select"]
+
+
+def normalize_space(text: str) -> str:
+    return " ".join(text.split())
+
+
+class BaseExtractor:
+    """Extract the visible text of an HTML page.
+
+    Text nodes are joined with single spaces and whitespace is collapsed, so every backend returns text in the
+    same shape as the original bs4 implementation.
+    """
+
+    name = "base"
+
+    def __init__(self, remove_boilerplate: bool = False):
+        """Initialize the extractor
+
+        Args:
+            remove_boilerplate (bool, optional): also drop navigation, footer, aside and widget elements. Defaults to False.
+        """
+        self.remove_boilerplate = remove_boilerplate
+        self.drop_tags = INVISIBLE_TAGS + (BOILERPLATE_TAGS if remove_boilerplate else [])
+
+    def extract(self, html: str) -> str:
+        raise NotImplementedError
+
+
+class Bs4Extractor(BaseExtractor):
+    """Pure-Python reference extractor based on BeautifulSoup's html.parser."""
+
+    name = "bs4"
+
+    def extract(self, html: str) -> str:
+        soup = bs4.BeautifulSoup(html, "html.parser")
+        for tag in soup(self.drop_tags):
+            tag.decompose()
+        texts = soup.find_all(string=True)
+        # comments and the doctype (a direct child of the document) are not visible
+        visible_text = [t for t in texts if not isinstance(t, bs4.element.Comment) and t.parent.name != "[document]"]
+        return normalize_space(" ".join(t.strip() for t in visible_text))
+
+
+class LxmlExtractor(BaseExtractor):
+    """libxml2-based extractor (lxml)."""
+
+    name = "lxml"
+
+    def __init__(self, remove_boilerplate: bool = False):
+        super().__init__(remove_boilerplate=remove_boilerplate)
+        self._xpath = "|".join(f"//{tag}" for tag in self.drop_tags) + "|//comment()"
+
+    def extract(self, html: str) -> str:
+        import lxml.html
+
+        tree = lxml.html.fromstring(html)
+        for element in tree.xpath(self._xpath):
+            element.drop_tree()
+        return normalize_space(" ".join(t.strip() for t in tree.itertext()))
+
+
+class SelectolaxExtractor(BaseExtractor):
+    """lexbor-based extractor (selectolax), the fastest backend."""
+
+    name = "selectolax"
+
+    def extract(self, html: str) -> str:
+        from selectolax.lexbor import LexborHTMLParser
+
+        tree = LexborHTMLParser(html)
+        tree.strip_tags(self.drop_tags)
+        if tree.root is None:
+            return ""
+        return normalize_space(tree.root.text(separator=" "))
+
+
+class FallbackExtractor(BaseExtractor):
+    """Use a fast extractor and fall back to bs4 when it fails on a page."""
+
+    def __init__(self, extractor: BaseExtractor):
+        super().__init__(remove_boilerplate=extractor.remove_boilerplate)
+        self.extractor = extractor
+        self.fallback = Bs4Extractor(remove_boilerplate=extractor.remove_boilerplate)
+        self.name = extractor.name
+
+    def extract(self, html: str) -> str:
+        try:
+            return self.extractor.extract(html)
+        except Exception as e:
+            logger.warning(f"{self.extractor.name} extraction failed ({e}), fall back to bs4.")
+            return self.fallback.extract(html)
+
+
+EXTRACTORS = {
+    "bs4": Bs4Extractor,
+    "lxml": LxmlExtractor,
+    "selectolax": SelectolaxExtractor,
+}
+# backend -> module it requires
+EXTRACTOR_DEPENDENCIES = {
+    "lxml": "lxml",
+    "selectolax": "selectolax",
+}
+
+
+def available_extractors() -> list[str]:
+    return [
+        name
+        for name in EXTRACTORS
+        if name not in EXTRACTOR_DEPENDENCIES or importlib.util.find_spec(EXTRACTOR_DEPENDENCIES[name]) is not None
+    ]
+
+
+def get_extractor(name: str = "auto", remove_boilerplate: bool = True) -> BaseExtractor:
+    """Build an HTML-to-text extractor.
+
+    Args:
+        name (str, optional): "bs4", "lxml", "selectolax", or "auto" for the fastest installed one. Defaults to "auto".
+        remove_boilerplate (bool, optional): drop page chrome such as navigation and footers. Defaults to True.
+
+    Returns:
+        BaseExtractor: the extractor, fast backends fall back to bs4 on failure.
+    """
+    available = available_extractors()
+    if name == "auto":
+        name = next(n for n in ["selectolax", "lxml", "bs4"] if n in available)
+    if name not in EXTRACTORS:
+        raise NotImplementedError(f"HTML extractor {name} not found!")
+    if name not in available:
+        logger.warning(f"HTML extractor {name} is not installed, use bs4 instead.")
+        name = "bs4"
+
+    extractor = EXTRACTORS[name](remove_boilerplate=remove_boilerplate)
+    if name == "bs4":
+        return extractor
+    return FallbackExtractor(extractor)
@@ -1,14 +1,25 @@
 import time
+import json
 import asyncio
+import hashlib
+import threading
 from abc import abstractmethod
 from functools import partial
 from collections import deque
 import inspect
 
 from ..data_class import TokenUsage
+from ..singleflight import SingleFlight
 
 
 class BaseClient:
+    # shared by all clients in the process, so identical prompts from concurrent requests are sent only once
+    single_flight = SingleFlight()
+    # api_config keys of the endpoint and credentials, calls to different endpoints or accounts are never coalesced
+    ENDPOINT_CONFIG_KEYS = ()
+    # whether `_call_n` samples several responses in one request
+    SUPPORTS_N_SAMPLING = False
+
     def __init__(
         self,
         model: str,
@@ -23,6 +34,9 @@ class BaseClient:
         self.traffic_queue = deque()
         self.total_traffic = 0
         self.usage = TokenUsage(model=model)
+        # requests sent, failed ones included; a coalesced caller sends none, see `_coalesced_call`
+        self.num_calls = 0
+        self._usage_lock = threading.Lock()
 
     @abstractmethod
     def _call(self, messages: str):
@@ -34,12 +48,60 @@ class BaseClient:
         """Log the usage of tokens, should be used in each client's _call method."""
         pass
 
+    def _record_usage(self, prompt_tokens: int, completion_tokens: int):
+        """Record the tokens of a call, once, in the usage of the caller that sent it."""
+        self._add_usage(prompt_tokens, completion_tokens)
+
+    def _add_usage(self, prompt_tokens: int, completion_tokens: int):
+        with self._usage_lock:
+            self.usage.prompt_tokens += prompt_tokens or 0
+            self.usage.completion_tokens = (self.usage.completion_tokens or 0) + (completion_tokens or 0)
+
+    def _endpoint_key(self) -> tuple:
+        api_config = self.api_config or {}
+        # the credentials are hashed, so they do not sit in plain text in the in-flight table
+        return tuple(
+            hashlib.sha256(str(api_config.get(k, "")).encode("utf-8")).hexdigest()[:16] for k in self.ENDPOINT_CONFIG_KEYS
+        )
+
+    def _call_counting_usage(self, call_fn, messages, **kwargs):
+        # run by the leader only, its tokens are recorded by `call_fn`
+        try:
+            return call_fn(messages, **kwargs)
+        finally:
+            with self._usage_lock:
+                self.num_calls += 1
+
+    def _coalescing_key(self, messages, call_fn=None, **kwargs) -> tuple:
+        return (
+            type(self).__name__,
+            (call_fn or self._call).__name__,
+            self._endpoint_key(),
+            self.model,
+            json.dumps(messages, sort_keys=True, ensure_ascii=False, default=str),
+            json.dumps(kwargs, sort_keys=True, default=str),
+        )
+
+    def _coalesced_call(self, messages, call_fn=None, on_lead=None, **kwargs):
+        """Call self._call (or `call_fn`, e.g. self._call_n), sharing the response with concurrent callers of the
+        same endpoint, credentials, model, messages and kwargs. The call and its tokens are counted once, in the
+        usage of the caller that sent it, so that the sum over clients is what was actually spent. `on_lead(token)`
+        is called if this caller leads the call, see `_abandon`."""
+        call_fn = call_fn or self._call
+        key = self._coalescing_key(messages, call_fn=call_fn, **kwargs)
+        return self.single_flight.do_with_lead(key, on_lead, self._call_counting_usage, call_fn, messages, **kwargs)
+
+    def get_coalescing_stats(self):
+        return self.single_flight.stats()
+
     def get_usage(self):
         return self.usage
 
     def reset_usage(self):
-        self.usage.prompt_tokens = 0
-        self.usage.completion_tokens = 0
+        with self._usage_lock:
+            self.usage.prompt_tokens = 0
+            self.usage.completion_tokens = 0
+            self.num_calls = 0
 
     @abstractmethod
     def construct_message_list(self, prompt_list: list[str]) -> list[str]:
@@ -61,7 +123,7 @@ class BaseClient:
         for _ in range(num_retries):
             try:
 
-                r = self._call(messages[0], seed=seed)
+                r = self._coalesced_call(messages[0], seed=seed)
                 break
             except Exception as e:
                 print(f"Error LLM Client call: {e} Retrying...")
@@ -102,6 +164,100 @@ class BaseClient:
 
 
 
+    def _call_n(self, messages: list, n: int, seed: int = 42) -> list:
+        """Sample n responses in one request, for clients with SUPPORTS_N_SAMPLING."""
+        raise NotImplementedError
+
+    async def _first_valid(self, messages: list, parse, seeds: list[int]):
+        task_keys = {}
+        for seed in seeds:
+            leads = []
+            task = asyncio.ensure_future(self._async_call(messages=messages, seed=seed, on_lead=leads.append))
+            task_keys[task] = (self._coalescing_key(messages, seed=seed), leads)
+        tasks = set(task_keys)
+        try:
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        print(f"Error LLM Client call: {task.exception()}")
+                        continue
+                    result = parse(task.result())
+                    if result is not None:
+                        return result
+            return None
+        finally:
+            self._abandon(task_keys)
+
+    def _run_async(self, coro):
+        """Run the coroutine on a new event loop, closed once it completes.
+
+        The tasks left on the loop, e.g. abandoned calls, are cancelled first; the executor is not waited for, so
+        the requests of abandoned calls keep running in their threads (see `_abandon`).
+        """
+        loop = asyncio.SelectorEventLoop()
+        asyncio.set_event_loop(loop)
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            try:
+                pending = asyncio.all_tasks(loop)
+                for task in pending:
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                loop.run_until_complete(loop.shutdown_asyncgens())
+            finally:
+                asyncio.set_event_loop(None)
+                loop.close()
+
+    @staticmethod
+    async def _gather(coros: list) -> list:
+        # gathered inside the loop, `asyncio.gather` outside of it would look for a current loop
+        return await asyncio.gather(*coros)
+
+    def call_until_valid(self, messages: list[str], parse, num_retries: int = 3, mode: str = None):
+        """Call the API with seeds 42, 43, ... until `parse(response)` accepts a response (returns not None).
+
+        Args:
+            messages (list): a single messages, see `construct_message_list`.
+            parse (callable): returns the parsed response, None if it is not valid.
+            num_retries (int, optional): number of seeds to try. Defaults to 3.
+            mode (str, optional): "sequential" tries the seeds one after the other, "parallel" sends them all at once
+                and keeps the first valid response, "n" samples them in a single request where the client supports
+                it (parallel otherwise, or if the request fails). LLM_SEED_SAMPLING of the config if None,
+                "sequential" if that is not set either. In parallel mode the requests still running once a valid
+                response arrives are not cancelled (see `_abandon`), they complete and are billed. Defaults to None.
+
+        Returns:
+            the first parsed response, None if no response is valid.
+        """
+        assert len(messages) == 1, "Only one message is allowed for this function."
+        mode = mode or (self.api_config or {}).get("LLM_SEED_SAMPLING", "sequential")
+        if mode == "n" and num_retries > 1 and self.SUPPORTS_N_SAMPLING:
+            try:
+                # rate limited and coalesced like any other call
+                responses = self._run_async(
+                    self._async_call(messages=messages[0], call_fn=self._call_n, n=num_retries, seed=42)
+                )
+            except Exception as e:
+                print(f"Error LLM Client n-sampling call: {e} Falling back to parallel seeds...")
+            else:
+                for response in responses:
+                    result = parse(response)
+                    if result is not None:
+                        return result
+                return None
+        if mode in ("n", "parallel") and num_retries > 1:
+            # the seeds race, the other calls are abandoned once a valid response arrives
+            return self._run_async(self._first_valid(messages[0], parse, [42 + i for i in range(num_retries)]))
+
+        for i in range(num_retries):
+            response = self.call(messages, num_retries=1, seed=42 + i)
+            result = parse(response)
+            if result is not None:
+                return result
+        return None
+
     def set_model(self, model: str):
         self.model = model
 
@@ -112,7 +268,7 @@ class BaseClient:
             self._expire_old_traffic()
 
         loop = asyncio.get_running_loop()
-        response = await loop.run_in_executor(None, partial(self._call, messages, **kwargs))
+        response = await loop.run_in_executor(None, partial(self._coalesced_call, messages, **kwargs))
 
         self.total_traffic += self.get_request_length(messages)
         self.traffic_queue.append((time.time(), self.get_request_length(messages)))
@@ -121,11 +277,121 @@ class BaseClient:
 
     def multi_call(self, messages_list, **kwargs):
         tasks = [self._async_call(messages=messages, **kwargs) for messages in messages_list]
-        asyncio.set_event_loop(asyncio.SelectorEventLoop())
-        loop = asyncio.get_event_loop()
-        responses = loop.run_until_complete(asyncio.gather(*tasks))
+        responses = self._run_async(self._gather(tasks))
         return responses
 
+    def _abandon(self, task_keys: dict):
+        """Give up on the calls of unfinished tasks.
+
+        Cancelling a task does not stop its call: the request keeps running in its executor thread until the API
+        answers (or its own timeout fires) and still costs its tokens. If the task leads its call, the key is
+        forgotten by the single-flight, so later identical calls do not wait behind a call that may be stuck; a
+        task that only waits for another caller's call leaves it in place, that caller has not given up on it.
+
+        Args:
+            task_keys (dict): task -> (coalescing key, the tokens `on_lead` reported to the task's call).
+        """
+        for task, (key, leads) in task_keys.items():
+            if not task.done():
+                task.cancel()
+                for token in leads:
+                    self.single_flight.forget(key, token)
+
+    async def _speculative_call(self, messages: list, seed: int, duplicate_seed: int, speculative_after: float = None, **kwargs):
+        """Call the API once, and once more with another seed if the first call is still running after
+        `speculative_after` seconds; return the first successful response and abandon the other call (see
+        `_abandon`, the abandoned request is not actually cancelled)."""
+        leads = []
+        task = asyncio.ensure_future(self._async_call(messages=messages, seed=seed, on_lead=leads.append, **kwargs))
+        task_keys = {task: (self._coalescing_key(messages, seed=seed, **kwargs), leads)}
+        tasks = {task}
+        try:
+            if speculative_after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=speculative_after)
+                if not done:
+                    # a different seed, so the duplicate is not coalesced into the straggling call
+                    duplicate_leads = []
+                    duplicate = asyncio.ensure_future(
+                        self._async_call(messages=messages, seed=duplicate_seed, on_lead=duplicate_leads.append, **kwargs)
+                    )
+                    task_keys[duplicate] = (self._coalescing_key(messages, seed=duplicate_seed, **kwargs), duplicate_leads)
+                    tasks.add(duplicate)
+            while True:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not tasks:
+                    raise next(iter(done)).exception()
+        finally:
+            # also reached when the item deadline cancels this call
+            self._abandon(task_keys)
+
+    async def _call_and_parse(self, messages: list, parse, num_retries: int, item_timeout: float, speculative_after: float, **kwargs):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + item_timeout if item_timeout is not None else None
+        for attempt in range(num_retries):
+            timeout = deadline - loop.time() if deadline is not None else None
+            if timeout is not None and timeout <= 0:
+                break
+            try:
+                response = await asyncio.wait_for(
+                    self._speculative_call(
+                        messages, seed=42 + attempt, duplicate_seed=42 + num_retries + attempt,
+                        speculative_after=speculative_after, **kwargs
+                    ),
+                    timeout=timeout,
+                )
+            except asyncio.TimeoutError:
+                print(f"LLM Client call exceeded the {item_timeout}s item deadline, giving up.")
+                break
+            except Exception as e:
+                print(f"Error LLM Client call: {e} Retrying...")
+                continue
+            result = parse(response, attempt)
+            if result is not None:
+                return result
+        return None
+
+    def multi_call_parsed(
+        self,
+        messages_list,
+        parse,
+        num_retries: int = 3,
+        item_timeout: float = None,
+        speculative_after: float = None,
+        **kwargs,
+    ) -> list:
+        """Call the API for every messages and parse each response, retrying every item on its own.
+
+        An item whose call fails or whose response can not be parsed is re-issued as soon as it fails, without
+        waiting for the other items, so one slow response does not hold back the retries of the others.
+
+        Args:
+            messages_list (list): the messages of every item, see `construct_message_list`.
+            parse (callable): `parse(response, attempt)` returns the parsed response, None to retry the item.
+            num_retries (int, optional): maximum attempts per item. Defaults to 3.
+            item_timeout (float, optional): seconds an item may take over all its attempts, LLM_ITEM_TIMEOUT of the
+                config if None, no deadline if that is not set either. The item is given up at the deadline, its
+                request is not cancelled (see `_abandon`). Defaults to None.
+            speculative_after (float, optional): seconds after which a still running call is duplicated with another
+                seed and the first response wins, LLM_SPECULATIVE_AFTER of the config if None, no duplicate if that
+                is not set either. Defaults to None.
+
+        Returns:
+            list: the parsed response of every item, None for the items that failed every attempt or timed out.
+        """
+        api_config = self.api_config or {}
+        if item_timeout is None and api_config.get("LLM_ITEM_TIMEOUT") is not None:
+            item_timeout = float(api_config["LLM_ITEM_TIMEOUT"])
+        if speculative_after is None and api_config.get("LLM_SPECULATIVE_AFTER") is not None:
+            speculative_after = float(api_config["LLM_SPECULATIVE_AFTER"])
+        tasks = [
+            self._call_and_parse(messages, parse, num_retries, item_timeout, speculative_after, **kwargs)
+            for messages in messages_list
+        ]
+        return self._run_async(self._gather(tasks))
+
     def _expire_old_traffic(self):
         """Expires traffic older than the request window."""
         current_time = time.time()
@@ -4,6 +4,8 @@ from .base import BaseClient
 
 
 class ClaudeClient(BaseClient):
+    ENDPOINT_CONFIG_KEYS = ("ANTHROPIC_API_KEY",)
+
     def __init__(
         self,
         model: str = "claude-3-opus-20240229",
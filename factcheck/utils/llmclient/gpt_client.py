@@ -6,6 +6,9 @@ import tiktoken
 
 
 class GPTClient(BaseClient):
+    ENDPOINT_CONFIG_KEYS = ("OPENAI_BASE_URL", "OPENAI_API_KEY")
+    SUPPORTS_N_SAMPLING = True
+
     def __init__(
             self,
             model: str = "google/gemini-2.5-flash",
@@ -50,10 +53,15 @@ class GPTClient(BaseClient):
 
         return r
 
+    def _call_n(self, messages: list, n: int, seed: int = 42):
+        response = self.client.chat.completions.create(seed=seed, model=self.model, messages=messages, n=n)
+        if hasattr(response, "usage"):
+            self._log_usage(usage_dict=response.usage)
+        return [choice.message.content for choice in response.choices]
+
     def _log_usage(self, usage_dict):
         try:
-            self.usage.prompt_tokens += usage_dict.prompt_tokens
-            self.usage.completion_tokens += usage_dict.completion_tokens
+            self._record_usage(usage_dict.prompt_tokens, usage_dict.completion_tokens)
         except:  # noqa E722
             print("Warning: prompt_tokens or completion_token not found in usage_dict")
 
@@ -11,6 +11,8 @@ class LocalOpenAIClient(BaseClient):
     see https://github.com/lm-sys/FastChat/blob/main/docs/openai_api.md for example usage.
     """
 
+    ENDPOINT_CONFIG_KEYS = ("LOCAL_API_URL", "LOCAL_API_KEY")
+
     def __init__(
         self,
         model: str = "",
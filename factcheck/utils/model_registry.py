@@ -0,0 +1,190 @@
+import gc
+import threading
+
+from factcheck.utils.logger import CustomLogger
+
+logger = CustomLogger(__name__).getlog()
+
+
+class ModelRegistry:
+    """Process-wide store of loaded models, each loaded once on first use and shared by all instances and threads.
+
+    Loading is serialized per model, so concurrent first users wait for one load instead of loading twice, while
+    different models can load in parallel.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, loader):
+        """Return the model stored under the key, calling `loader()` to load it on first use."""
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._models:
+                logger.info(f"Loading model {key} ...")
+                self._models[key] = loader()
+            return self._models[key]
+
+    def loaded(self) -> list[tuple]:
+        return list(self._models.keys())
+
+    def clear(self):
+        with self._lock:
+            self._models = {}
+            self._key_locks = {}
+
+
+registry = ModelRegistry()
+
+# int8 export of the ONNX cross-encoders on the hub, pick another export (e.g. "onnx/model_qint8_arm64.onnx")
+# on CPUs without AVX-512 VNNI
+DEFAULT_QUANTIZED_ONNX_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+
+def _default_device():
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def get_spacy_model(name: str = "en_core_web_sm", disable: tuple = ("ner", "tagger", "lemmatizer")):
+    """Return the shared spaCy pipeline."""
+
+    def _load():
+        import spacy
+
+        return spacy.load(name, disable=list(disable))
+
+    return registry.get(("spacy", name, tuple(disable)), _load)
+
+
+def get_spacy_sentencizer(lang: str = "en"):
+    """Return the shared rule-based spaCy sentence splitter, a blank pipeline with only the sentencizer."""
+
+    def _load():
+        import spacy
+
+        nlp = spacy.blank(lang)
+        nlp.add_pipe("sentencizer")
+        return nlp
+
+    return registry.get(("spacy_sentencizer", lang), _load)
+
+
+def load_cross_encoder(
+    name: str,
+    max_length: int = 512,
+    device: str = "cpu",
+    backend: str = "torch",
+    quantize: bool = False,
+    num_threads: int = None,
+    onnx_file_name: str = None,
+):
+    """Load a sentence-transformers CrossEncoder, optionally on ONNX Runtime and/or with int8 weights.
+
+    Args:
+        name (str): the checkpoint.
+        max_length (int, optional): maximum number of tokens per pair. Defaults to 512.
+        device (str, optional): "cpu" or "cuda". Defaults to "cpu".
+        backend (str, optional): "torch" or "onnx", onnx falls back to torch if it can not be loaded. Defaults to "torch".
+        quantize (bool, optional): use int8 weights (dynamic quantization on torch, the `onnx_file_name` export on onnx),
+            CPU only. Defaults to False.
+        num_threads (int, optional): intra-op threads of this model's ONNX Runtime session, onnx only. The torch
+            thread pool is process-wide, the application sets it with `torch.set_num_threads`. Defaults to None.
+        onnx_file_name (str, optional): the ONNX file of the checkpoint to load, the default export if None, or
+            DEFAULT_QUANTIZED_ONNX_FILE with `quantize`. Defaults to None.
+    """
+    from sentence_transformers import CrossEncoder
+
+    if backend == "onnx":
+        file_name = onnx_file_name or (DEFAULT_QUANTIZED_ONNX_FILE if quantize else None)
+        model_kwargs = {"file_name": file_name} if file_name else {}
+        if num_threads:
+            import onnxruntime
+
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = num_threads
+            model_kwargs["session_options"] = session_options
+        try:
+            return CrossEncoder(name, max_length=max_length, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+        except Exception as e:
+            logger.warning(f"Load ONNX backend for {name} failed ({e}), fall back to torch.")
+
+    import torch
+
+    if num_threads:
+        logger.info(f"num_threads is ignored for the torch backend of {name}, torch threads are process-wide.")
+    model = CrossEncoder(name, max_length=max_length, device="cpu" if quantize else device)
+    if quantize:
+        model.model = torch.quantization.quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def get_cross_encoder(
+    name: str,
+    max_length: int = 512,
+    device: str = None,
+    backend: str = "torch",
+    quantize: bool = False,
+    num_threads: int = None,
+    onnx_file_name: str = None,
+):
+    """Return the shared CrossEncoder for these settings, see `load_cross_encoder` for the arguments.
+
+    The device defaults to cuda when available.
+    """
+    device = device or _default_device()
+    key = ("cross_encoder", name, max_length, device, backend, quantize, num_threads, onnx_file_name)
+    return registry.get(
+        key,
+        lambda: load_cross_encoder(
+            name,
+            max_length=max_length,
+            device=device,
+            backend=backend,
+            quantize=quantize,
+            num_threads=num_threads,
+            onnx_file_name=onnx_file_name,
+        ),
+    )
+
+
+def get_sentence_transformer(name: str, device: str = "cpu"):
+    """Return the shared SentenceTransformer embedding model."""
+
+    def _load():
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(name, device=device)
+
+    return registry.get(("sentence_transformer", name, device), _load)
+
+
+def preload_models(
+    spacy_models: list[str] = ("en_core_web_sm",),
+    cross_encoders: list[str] = ("cross-encoder/ms-marco-MiniLM-L-6-v2",),
+    sentence_transformers: list[str] = (),
+    freeze: bool = True,
+):
+    """Load models in the parent process before forking workers (e.g. a pre-forking web server).
+
+    The forked workers then share the model weights copy-on-write instead of loading their own copy. With
+    `freeze`, the objects allocated so far are moved out of the garbage collector's reach (`gc.freeze`), so
+    collections in the workers do not touch, and copy, their pages.
+    """
+    for name in spacy_models:
+        get_spacy_model(name)
+    for name in cross_encoders:
+        get_cross_encoder(name)
+    for name in sentence_transformers:
+        get_sentence_transformer(name)
+    if freeze:
+        gc.collect()
+        gc.freeze()
+    return registry.loaded()
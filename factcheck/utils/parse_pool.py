@@ -0,0 +1,164 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from factcheck.utils.html_extractor import BaseExtractor
+from factcheck.utils.logger import CustomLogger
+
+logger = CustomLogger(__name__).getlog()
+
+
+def extend_snippet_in_text(text: str, snippet: str, post_context_range: int = 500):
+    """Locate the snippet in the text and return it with the following context, None if it is not found.
+
+    Args:
+        text (str): the text to search.
+        snippet (str): the snippet to locate, its last 10 characters are ignored when searching.
+        post_context_range (int, optional): number of characters kept after the snippet. Defaults to 500.
+
+    Returns:
+        str: the snippet and its context window, or None.
+    """
+    snippet_start = text.find(snippet[:-10]) if len(snippet) > 10 else text.find(snippet)
+    if snippet_start == -1:
+        return None
+    end = snippet_start + len(snippet) + post_context_range
+    return text[snippet_start:end] + " ..."
+
+
+def extract_snippet_window(content: bytes, encoding: str, snippet: str, extractor: BaseExtractor, return_text: bool = False):
+    """Worker task: extract the page text and return only the window around the snippet.
+
+    Args:
+        return_text (bool, optional): also send back the whole extracted text, e.g. to cache it. Defaults to False.
+
+    Returns:
+        tuple: ((extended snippet or None, extracted text or None), parse seconds spent in the worker)
+    """
+    st = time.perf_counter()
+    try:
+        text = extractor.extract(content.decode(encoding or "utf-8", errors="replace"))
+        window = extend_snippet_in_text(text, snippet)
+    except Exception:
+        text, window = None, None
+    return (window, text if return_text else None), time.perf_counter() - st
+
+
+def extract_page_text(content: bytes, encoding: str, url: str, query: str, extractor: BaseExtractor):
+    """Worker task: extract the visible text of a crawled page.
+
+    Returns:
+        tuple: ((text or None, url, query), parse seconds spent in the worker)
+    """
+    st = time.perf_counter()
+    try:
+        text = extractor.extract(content.decode(encoding or "utf-8", errors="replace"))
+    except Exception:
+        text = None
+    return (text, url, query), time.perf_counter() - st
+
+
+class ParsePool:
+    """A persistent process pool for CPU-bound page parsing.
+
+    HTML parsing is pure Python for the most part, so threads serialize on the GIL. Workers are started once and
+    reused across requests; tasks should ship raw bytes in and small results out. Parse time measured inside the
+    workers is accumulated for monitoring.
+    """
+
+    def __init__(self, max_workers: int = None, start_method: str = "spawn"):
+        """Initialize the ParsePool class
+
+        Args:
+            max_workers (int, optional): number of worker processes. Defaults to os.cpu_count().
+            start_method (str, optional): multiprocessing start method, "spawn" is safe with the loop threads. Defaults to "spawn".
+        """
+        self.max_workers = max_workers or os.cpu_count()
+        self.start_method = start_method
+        self._executor = None
+        self._lock = threading.Lock()
+        self.tasks = 0
+        self.parse_seconds = 0.0
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context(self.start_method)
+                )
+            return self._executor
+
+    def as_completed_timed(self, fn, args_list: list[tuple]):
+        """Run `fn(*args)` for every args tuple in the pool. `fn` must return (result, parse seconds).
+
+        Yields:
+            tuple: (index in `args_list`, result without the timing, parse seconds of the task), as soon as each
+                task completes.
+        """
+        if not args_list:
+            return
+        done = set()
+        try:
+            executor = self._ensure_executor()
+            futures = {executor.submit(fn, *args): i for i, args in enumerate(args_list)}
+            outputs = ((futures[future], future.result()) for future in as_completed(futures))
+            for i, (result, seconds) in outputs:
+                self._record(seconds)
+                done.add(i)
+                yield i, result, seconds
+        except BrokenProcessPool as e:
+            logger.warning(f"Parse pool broken ({e}), parse in the current process instead.")
+            self.shutdown()
+            for i, args in enumerate(args_list):
+                if i not in done:
+                    result, seconds = fn(*args)
+                    self._record(seconds)
+                    yield i, result, seconds
+
+    def map_timed(self, fn, args_list: list[tuple]) -> tuple[list, float]:
+        """Like `as_completed_timed`, but return the results in the order of `args_list`.
+
+        Returns:
+            tuple: (results, parse seconds summed over the tasks of this call only)
+        """
+        results = [None] * len(args_list)
+        parse_seconds = 0.0
+        for i, result, seconds in self.as_completed_timed(fn, args_list):
+            results[i] = result
+            parse_seconds += seconds
+        return results, parse_seconds
+
+    def _record(self, parse_seconds: float):
+        with self._lock:
+            self.tasks += 1
+            self.parse_seconds += parse_seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": self.max_workers, "tasks": self.tasks, "parse_seconds": round(self.parse_seconds, 4)}
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_shared_parse_pool = None
+_shared_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool(api_config: dict = None) -> ParsePool:
+    """Return the process-wide parse pool, created from the PARSE_POOL_* config keys on first use."""
+    global _shared_parse_pool
+    with _shared_parse_pool_lock:
+        if _shared_parse_pool is None:
+            api_config = api_config or dict()
+            _shared_parse_pool = ParsePool(
+                max_workers=api_config.get("PARSE_POOL_WORKERS"),
+                start_method=api_config.get("PARSE_POOL_START_METHOD", "spawn"),
+            )
+        return _shared_parse_pool
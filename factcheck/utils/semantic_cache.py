@@ -0,0 +1,284 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+import importlib.util
+
+import numpy as np
+
+from factcheck.utils.logger import CustomLogger
+from factcheck.utils.model_registry import get_sentence_transformer
+
+logger = CustomLogger(__name__).getlog()
+
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+WORD_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+# embeddings barely separate a claim from its negation, both must negate as often
+NEGATION_WORDS = {
+    "not", "no", "never", "none", "nobody", "nothing", "neither", "nor", "without", "cannot", "nowhere",
+}
+NEGATION_CJK = ("不", "没", "未", "无", "非", "别")
+# groups of opposite words, (one side, other side): claims using the two sides of a group do not match,
+# "sales rose" never matches "sales fell", while "rose" and "increased" are the same side
+ANTONYM_GROUPS = [
+    (
+        {"increase", "increased", "increases", "rise", "rises", "rose", "risen", "grow", "grows", "grew", "grown",
+         "gain", "gained", "gains", "up", "增加", "增长", "上升", "上涨"},
+        {"decrease", "decreased", "decreases", "fall", "falls", "fell", "fallen", "drop", "drops", "dropped",
+         "decline", "declines", "declined", "shrink", "shrinks", "shrank", "down", "减少", "下降", "下跌"},
+    ),
+    (
+        {"more", "higher", "greater", "larger", "bigger", "above", "over", "exceeds", "高于", "多于", "超过"},
+        {"less", "fewer", "lower", "smaller", "below", "under", "低于", "少于"},
+    ),
+    (
+        {"most", "highest", "largest", "biggest", "first", "maximum", "最高", "最大", "第一"},
+        {"least", "lowest", "smallest", "last", "minimum", "最低", "最小", "最后"},
+    ),
+    ({"before", "earlier", "之前"}, {"after", "later", "之后"}),
+    ({"win", "wins", "won", "winning", "victory", "赢", "胜"}, {"lose", "loses", "lost", "losing", "defeat", "输", "败"}),
+    (
+        {"support", "supports", "supported", "approve", "approved", "accept", "accepted", "allow", "allowed", "legal",
+         "支持", "批准"},
+        {"oppose", "opposes", "opposed", "reject", "rejected", "ban", "banned", "illegal", "反对", "拒绝", "禁止"},
+    ),
+    ({"true", "correct", "confirmed", "alive"}, {"false", "incorrect", "denied", "dead", "died"}),
+]
+
+
+class VectorIndex:
+    """Inner-product index over normalized vectors: HNSW (faiss) when installed, exact numpy search otherwise.
+
+    Vectors can not be removed; rebuild the index to drop them.
+    """
+
+    def __init__(self, dim: int, use_faiss: bool = None):
+        self.dim = dim
+        self.use_faiss = importlib.util.find_spec("faiss") is not None if use_faiss is None else use_faiss
+        if self.use_faiss:
+            import faiss
+
+            self._index = faiss.IndexIDMap(faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT))
+        else:
+            self._vectors = np.zeros((0, dim), dtype=np.float32)
+            self._ids = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return self._index.ntotal if self.use_faiss else len(self._ids)
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64)
+        if self.use_faiss:
+            self._index.add_with_ids(vectors, ids)
+        else:
+            self._vectors = np.vstack([self._vectors, vectors])
+            self._ids = np.concatenate([self._ids, ids])
+
+    def search(self, vectors: np.ndarray, k: int):
+        """Return (similarities, ids) of shape (len(vectors), k), ids are -1 where there are fewer than k vectors."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.use_faiss:
+            return self._index.search(vectors, k)
+        sims = np.full((len(vectors), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(vectors), k), -1, dtype=np.int64)
+        if len(self._ids):
+            scores = vectors @ self._vectors.T
+            top = np.argsort(-scores, axis=1)[:, :k]
+            sims[:, : top.shape[1]] = np.take_along_axis(scores, top, axis=1)
+            ids[:, : top.shape[1]] = self._ids[top]
+        return sims, ids
+
+
+class SemanticVerdictCache:
+    """Cache of claim -> verified evidences, looked up by embedding similarity.
+
+    Reworded repeats of a recently verified claim reuse its verification instead of being searched and verified
+    again. Claims match when the cosine similarity of their embeddings reaches `threshold`, they mention the
+    same numbers, so "grew 16.64%" never matches "grew 6.64%", and they have the same polarity (as many negations,
+    no opposite words), so "is not" never matches "is" and "rose" never matches "fell". Entries expire after `ttl` seconds.
+    The entries are persisted in SQLite and the vectors are indexed in memory on startup.
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        ttl: float = 7 * 86400,
+        threshold: float = 0.92,
+        model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        num_candidates: int = 8,
+    ):
+        """Initialize the SemanticVerdictCache class
+
+        Args:
+            path (str, optional): path of the SQLite file, in-memory only if None. Defaults to None.
+            ttl (float, optional): seconds before an entry expires. Defaults to 7 days.
+            threshold (float, optional): minimum cosine similarity of a hit. Defaults to 0.92.
+            model_name (str, optional): the sentence embedding model.
+                Defaults to "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2".
+            num_candidates (int, optional): nearest neighbours checked per claim. Defaults to 8.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.threshold = threshold
+        self.model_name = model_name
+        self.num_candidates = num_candidates
+        self.hits = 0
+        self.misses = 0
+        self._model = None
+        self._index = None
+        self._lock = threading.Lock()
+
+        if path is not None and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, claim TEXT, embedding BLOB, value TEXT, created_at REAL)"
+        )
+        self._conn.commit()
+        with self._lock:
+            self._purge_expired()
+            self._rebuild_index()
+
+    @classmethod
+    def from_config(cls, api_config: dict):
+        """Build the cache from the SEMANTIC_CACHE_* config keys, None if SEMANTIC_CACHE is off."""
+        api_config = api_config or dict()
+        if not api_config.get("SEMANTIC_CACHE", False):
+            return None
+        return cls(
+            path=api_config.get("SEMANTIC_CACHE_PATH", "./cache/verdict_cache.sqlite"),
+            ttl=float(api_config.get("SEMANTIC_CACHE_TTL", 7 * 86400)),
+            threshold=float(api_config.get("SEMANTIC_CACHE_THRESHOLD", 0.92)),
+            model_name=api_config.get(
+                "SEMANTIC_CACHE_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+            ),
+        )
+
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        if self._model is None:
+            self._model = get_sentence_transformer(self.model_name)
+        return self._model.encode(texts, normalize_embeddings=True, show_progress_bar=False).astype(np.float32)
+
+    def _purge_expired(self) -> int:
+        cursor = self._conn.execute("DELETE FROM verdicts WHERE created_at < ?", (time.time() - self.ttl,))
+        self._conn.commit()
+        return cursor.rowcount
+
+    def _rebuild_index(self):
+        rows = self._conn.execute("SELECT id, embedding FROM verdicts").fetchall()
+        self._index = None
+        if rows:
+            vectors = np.stack([np.frombuffer(embedding, dtype=np.float32) for _, embedding in rows])
+            self._index = VectorIndex(vectors.shape[1])
+            self._index.add(vectors, np.array([i for i, _ in rows]))
+
+    @staticmethod
+    def _same_numbers(a: str, b: str) -> bool:
+        return sorted(NUMBER_PATTERN.findall(a)) == sorted(NUMBER_PATTERN.findall(b))
+
+    @staticmethod
+    def _polarity(text: str) -> tuple[int, list[set]]:
+        """The number of negations of a text, and the sides of every antonym group it uses."""
+        lowered = text.lower()
+        tokens = WORD_PATTERN.findall(lowered)
+        words = set(tokens)
+        negations = sum(1 for word in tokens if word in NEGATION_WORDS or word.endswith("n't"))
+        negations += sum(lowered.count(c) for c in NEGATION_CJK)
+        sides = []
+        for group in ANTONYM_GROUPS:
+            used = set()
+            for side, terms in enumerate(group):
+                # CJK text has no spaces, its terms are matched as substrings
+                if any(term in words if term.isascii() else term in lowered for term in terms):
+                    used.add(side)
+            sides.append(used)
+        return negations, sides
+
+    @classmethod
+    def _same_polarity(cls, a: str, b: str) -> bool:
+        negations_a, sides_a = cls._polarity(a)
+        negations_b, sides_b = cls._polarity(b)
+        if negations_a != negations_b:
+            return False
+        # a group used by one claim only is left alone, it may just be worded differently
+        return all(not used_a or not used_b or used_a == used_b for used_a, used_b in zip(sides_a, sides_b))
+
+    def lookup(self, claims: list[str]) -> dict[str, dict]:
+        """Find cached verifications for the claims.
+
+        Args:
+            claims (list[str]): the claims to look up.
+
+        Returns:
+            dict: {claim: {"claim", "similarity", "created_at", "evidences"}} for the claims with a hit, where
+                "claim" is the wording that was verified and "evidences" its verified evidences (dicts).
+        """
+        if not claims:
+            return {}
+        with self._lock:
+            if self._index is None:
+                self.misses += len(claims)
+                return {}
+        vectors = self._embed(claims)
+        found = {}
+        with self._lock:
+            if self._index is None:
+                self.misses += len(claims)
+                return {}
+            sims, ids = self._index.search(vectors, min(self.num_candidates, len(self._index)))
+            oldest = time.time() - self.ttl
+            for claim, _sims, _ids in zip(claims, sims, ids):
+                for sim, entry_id in zip(_sims, _ids):
+                    if entry_id < 0 or sim < self.threshold:
+                        break
+                    row = self._conn.execute(
+                        "SELECT claim, value, created_at FROM verdicts WHERE id = ?", (int(entry_id),)
+                    ).fetchone()
+                    if row is None or row[2] < oldest or not self._same_numbers(claim, row[0]):
+                        continue
+                    if not self._same_polarity(claim, row[0]):
+                        continue
+                    found[claim] = {
+                        "claim": row[0],
+                        "similarity": round(float(sim), 4),
+                        "created_at": row[2],
+                        "evidences": json.loads(row[1]),
+                    }
+                    break
+            self.hits += len(found)
+            self.misses += len(claims) - len(found)
+        return found
+
+    def add(self, claim2evidences: dict[str, list[dict]]):
+        """Cache the verified evidences ({"text", "url", "reasoning", "relationship", ...} dicts) of the claims."""
+        claims = list(claim2evidences.keys())
+        if not claims:
+            return
+        vectors = self._embed(claims)
+        now = time.time()
+        with self._lock:
+            ids = []
+            for claim, vector in zip(claims, vectors):
+                cursor = self._conn.execute(
+                    "INSERT INTO verdicts (claim, embedding, value, created_at) VALUES (?, ?, ?, ?)",
+                    (claim, vector.tobytes(), json.dumps(claim2evidences[claim], ensure_ascii=False), now),
+                )
+                ids.append(cursor.lastrowid)
+            self._conn.commit()
+            if self._purge_expired() > 0 or self._index is None:
+                self._rebuild_index()
+            else:
+                self._index.add(vectors, np.array(ids))
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into a single in-flight execution.
+
+    The first caller of a key (the leader) runs the function, every caller arriving while it is still running
+    waits for the leader's result instead of issuing the same request again. Nothing is cached once the leader
+    finishes. In-flight results are kept in `concurrent.futures.Future` objects, so callers may come from
+    different threads and different event loops (`multi_call` and `crawl_web` each run their own loop).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: dict = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def _join(self, key):
+        """Return the in-flight future for the key and whether the caller is the leader."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            self.executed += 1
+            return future, True
+
+    def _release(self, key, future: Future, result=None, exception: BaseException = None):
+        with self._lock:
+            # the key may have been forgotten and taken by a new leader meanwhile, leave that one in place
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Call `fn(*args, **kwargs)` unless a call with the same key is already in flight, then wait for it.
+
+        Args:
+            key (hashable): identity of the call, callers with equal keys share one execution.
+            fn (callable): the function to execute.
+
+        Returns:
+            any: the result of the (possibly shared) call, exceptions are re-raised to every caller.
+        """
+        return self.do_with_lead(key, None, fn, *args, **kwargs)
+
+    def do_with_lead(self, key, on_lead, fn, *args, **kwargs):
+        """Same as `do`, and if the caller leads the call, `on_lead(token)` is called before `fn` runs.
+
+        Only the leader may `forget` its call: pass the token to `forget`, so that a caller that merely waits for
+        the call, or one that led an earlier call of the key, does not forget another leader's call.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        if on_lead is not None:
+            on_lead(future)
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._release(key, future, exception=e)
+            raise
+        self._release(key, future, result=result)
+        return result
+
+    async def do_async(self, key, coro_fn, *args, **kwargs):
+        """Async version of `do`, `coro_fn(*args, **kwargs)` must return an awaitable."""
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await coro_fn(*args, **kwargs)
+        except BaseException as e:
+            self._release(key, future, exception=e)
+            raise
+        self._release(key, future, result=result)
+        return result
+
+    def forget(self, key, token=None):
+        """Stop coalescing new callers of the key into the call in flight, e.g. one its caller gave up on.
+
+        The running call is not interrupted, it still delivers its result to the callers already waiting for it;
+        the next caller of the key becomes a new leader instead of waiting behind a call that may be stuck.
+
+        Args:
+            key (hashable): identity of the call.
+            token (optional): the token `do_with_lead` reported to the leader, the key is then forgotten only if
+                that call is still the one in flight. Defaults to None, forget whatever call is in flight.
+        """
+        with self._lock:
+            if token is None or self._inflight.get(key) is token:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        """Return the number of executed calls, coalesced callers and calls currently in flight."""
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._inflight)}
+
+    def reset_stats(self):
+        with self._lock:
+            self.executed = 0
+            self.coalesced = 0
@@ -1,3 +1,4 @@
+import re
 import yaml
 
 
@@ -10,4 +11,59 @@ def load_yaml(config_path):
             return yaml.safe_load(file)
     except Exception as e:
         print(f"Error loading api config: {e}")
-        return {}
\ No newline at end of file
+        return {}
+
+
+# a CJK character is a token on its own, other scripts are split into words (\w also matches CJK, so CJK is
+# excluded from the word class, otherwise a CJK run following a word would be glued to it, e.g. "2024年")
+# bump TOKENIZER_VERSION whenever `tokenize` changes: built BM25 indexes record it and refuse to load with another
+TOKENIZER_VERSION = 2
+TOKEN_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]|[^\W\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased word tokens of a text, CJK characters are tokenized individually."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+# a sentence ends with CJK or western terminal punctuation, optionally followed by closing quotes/brackets
+CJK_SENTENCE_END = re.compile(r"(?<=[。！？!?；;…])[”’」』）)\]]*|\n+")
+
+
+def is_cjk_text(text: str, sample_chars: int = 2000, min_ratio: float = 0.3) -> bool:
+    """Whether CJK characters make up at least `min_ratio` of the non-space characters of the text sample."""
+    sample = "".join(text[:sample_chars].split())
+    return bool(sample) and len(CJK_PATTERN.findall(sample)) / len(sample) >= min_ratio
+
+
+def split_cjk_sentences(text: str) -> list[str]:
+    """Split Chinese/Japanese/Korean text into sentences on terminal punctuation and line breaks."""
+    sentences, start = [], 0
+    for m in CJK_SENTENCE_END.finditer(text):
+        sentence = text[start : m.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = m.end()
+    if text[start:].strip():
+        sentences.append(text[start:].strip())
+    return sentences
+
+
+def make_length_batches(pairs: list[tuple[str, str]], batch_size: int = 32, max_batch_chars: int = 32000) -> list[list[int]]:
+    """Group pair indices into length-sorted batches bounded by pair count and total characters.
+
+    Pairs of similar length end up in the same batch, so short pairs are not padded to the longest one.
+    """
+    order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+    batches, batch, batch_chars = [], [], 0
+    for i in order:
+        pair_chars = len(pairs[i][0]) + len(pairs[i][1])
+        if batch and (len(batch) >= batch_size or batch_chars + pair_chars > max_batch_chars):
+            batches.append(batch)
+            batch, batch_chars = [], 0
+        batch.append(i)
+        batch_chars += pair_chars
+    if batch:
+        batches.append(batch)
+    return batches
@@ -2,15 +2,32 @@ import requests
 import backoff
 import time
 import bs4
+import socket
 import asyncio
-from httpx import AsyncHTTPTransport
-from httpx._client import AsyncClient
+import threading
+import importlib.util
+from typing import Optional
+from urllib.parse import urlsplit
 
+import httpx
+import httpcore
+
+from factcheck.utils.async_util import EventLoopThread
+from factcheck.utils.cache import PageCache
+from factcheck.utils.html_extractor import BaseExtractor, get_extractor
+from factcheck.utils.logger import CustomLogger
+
+logger = CustomLogger(__name__).getlog()
 
 USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.14; rv:65.0) Gecko/20100101 Firefox/65.0"
 # mobile user-agent
 MOBILE_USER_AGENT = "Mozilla/5.0 (Linux; Android 7.0; SM-G930V Build/NRD90M) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/59.0.3071.125 Mobile Safari/537.36"
 headers = {"User-Agent": USER_AGENT}
+# only advertise the encodings httpx can decode in this environment
+ACCEPT_ENCODING = ", ".join(
+    ["gzip", "deflate"]
+    + (["br"] if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi") else [])
+)
 
 
 def is_tag_visible(element: bs4.element) -> bool:
@@ -33,37 +50,325 @@ def is_tag_visible(element: bs4.element) -> bool:
     return True
 
 
-transport = AsyncHTTPTransport(retries=3)
+class DNSCacheBackend(httpcore.AsyncNetworkBackend):
+    """httpcore network backend that caches resolved addresses, so keep-alive misses do not pay DNS again.
+
+    TLS still uses the original host name for SNI and certificate checks, only the TCP connect uses the cached IP.
+    """
 
+    def __init__(self, backend: httpcore.AsyncNetworkBackend, ttl: float = 300):
+        self._backend = backend
+        self.ttl = ttl
+        self._cache = dict()
 
-async def httpx_get(url: str, headers: dict):
-    try:
-        async with AsyncClient(transport=transport) as client:
-            response = await client.get(url, headers=headers, timeout=3)
-            response = response if response.status_code == 200 else None
-            if not response:
-                return False, None
-            else:
-                return True, response
-    except Exception as e:  # noqa: F841
-        return False, None
+    async def _resolve(self, host: str, port: int) -> str:
+        cached = self._cache.get((host, port))
+        if cached is not None and time.monotonic() - cached[1] < self.ttl:
+            return cached[0]
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, family=socket.AF_INET, type=socket.SOCK_STREAM)
+        ip = infos[0][4][0]
+        self._cache[(host, port)] = (ip, time.monotonic())
+        return ip
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        kwargs = dict(timeout=timeout, local_address=local_address, socket_options=socket_options)
+        try:
+            ip = await self._resolve(host, port)
+        except OSError:
+            # e.g. IPv6-only hosts, let the wrapped backend resolve them
+            return await self._backend.connect_tcp(host, port, **kwargs)
+        try:
+            return await self._backend.connect_tcp(ip, port, **kwargs)
+        except httpcore.ConnectError:
+            # the cached address may be stale, resolve again through the wrapped backend
+            self._cache.pop((host, port), None)
+            return await self._backend.connect_tcp(host, port, **kwargs)
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class WebCrawler:
+    """Crawl web pages with one long-lived, pooled `httpx.AsyncClient`.
+
+    The client lives on a background event loop, so connections are kept alive and reused across URLs and across
+    requests. It speaks HTTP/2 when `h2` is installed, caches DNS lookups, and bounds connections both globally and
+    per host. Connect and read timeouts are configured separately, and connect retries default to none so that a
+    dead host fails fast.
+
+    Pages are streamed: PDFs and non-HTML content types are never downloaded, bodies are capped at
+    `max_page_bytes`, and a page can stop early once a given snippet plus its context window has been read.
+    """
+
+    ALLOWED_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+    # number of leading snippet characters searched for in the raw page
+    STOP_PROBE_CHARS = 40
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_connections_per_host: int = 6,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 5.0,
+        http2: bool = True,
+        dns_cache_ttl: float = 300,
+        retries: int = 0,
+        max_page_bytes: int = 512 * 1024,
+        stop_context_bytes: int = 16 * 1024,
+    ):
+        """Initialize the WebCrawler class
+
+        Args:
+            max_connections (int, optional): maximum number of open connections. Defaults to 100.
+            max_connections_per_host (int, optional): maximum number of concurrent requests per host. Defaults to 6.
+            connect_timeout (float, optional): seconds to establish a connection. Defaults to 3.0.
+            read_timeout (float, optional): seconds to wait for each chunk of the response. Defaults to 5.0.
+            http2 (bool, optional): use HTTP/2 when the `h2` package is available. Defaults to True.
+            dns_cache_ttl (float, optional): seconds to keep resolved addresses, 0 to disable. Defaults to 300.
+            retries (int, optional): connect retries per request. Defaults to 0.
+            max_page_bytes (int, optional): maximum decompressed bytes read per page. Defaults to 512 KB.
+            stop_context_bytes (int, optional): bytes read after an early-stop snippet is found. Defaults to 16 KB.
+        """
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = httpx.Timeout(connect=connect_timeout, read=read_timeout, write=read_timeout, pool=connect_timeout)
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self.dns_cache_ttl = dns_cache_ttl
+        self.retries = retries
+        self.max_page_bytes = max_page_bytes
+        self.stop_context_bytes = stop_context_bytes
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores = dict()
+        self._loop_thread = EventLoopThread(name="web-crawler-loop")
+
+    @classmethod
+    def from_config(cls, api_config: dict = None):
+        """Build a crawler from the CRAWL_* keys of the api configuration."""
+        api_config = api_config or dict()
+        return cls(
+            max_connections=int(api_config.get("CRAWL_MAX_CONNECTIONS", 100)),
+            max_connections_per_host=int(api_config.get("CRAWL_MAX_CONNECTIONS_PER_HOST", 6)),
+            connect_timeout=float(api_config.get("CRAWL_CONNECT_TIMEOUT", 3.0)),
+            read_timeout=float(api_config.get("CRAWL_READ_TIMEOUT", 5.0)),
+            http2=bool(api_config.get("CRAWL_HTTP2", True)),
+            dns_cache_ttl=float(api_config.get("CRAWL_DNS_CACHE_TTL", 300)),
+            retries=int(api_config.get("CRAWL_RETRIES", 0)),
+            max_page_bytes=int(api_config.get("CRAWL_MAX_PAGE_BYTES", 512 * 1024)),
+            stop_context_bytes=int(api_config.get("CRAWL_STOP_CONTEXT_BYTES", 16 * 1024)),
+        )
+
+    async def _ensure_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            transport = httpx.AsyncHTTPTransport(
+                http2=self.http2,
+                retries=self.retries,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=30,
+                ),
+            )
+            if self.dns_cache_ttl > 0:
+                self._install_dns_cache(transport)
+            self._client = httpx.AsyncClient(
+                transport=transport,
+                headers={**headers, "Accept-Encoding": ACCEPT_ENCODING},
+                timeout=self.timeout,
+            )
+        return self._client
+
+    def _install_dns_cache(self, transport: httpx.AsyncHTTPTransport) -> bool:
+        """Wrap the network backend of the transport's connection pool with `DNSCacheBackend`.
+
+        httpx does not expose the backend, so this relies on the private `_pool._network_backend` attributes of
+        the httpx/httpcore versions pinned in pyproject.toml; if they are missing, DNS is not cached and a warning
+        is logged.
+        """
+        pool = getattr(transport, "_pool", None)
+        backend = getattr(pool, "_network_backend", None)
+        if not isinstance(backend, httpcore.AsyncNetworkBackend):
+            logger.warning(
+                f"DNS cache disabled: httpx {httpx.__version__} / httpcore {httpcore.__version__} do not expose "
+                "the connection pool's network backend."
+            )
+            return False
+        pool._network_backend = DNSCacheBackend(backend, ttl=self.dns_cache_ttl)
+        return True
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.max_connections_per_host)
+        return self._host_semaphores[host]
+
+    def _is_allowed_content_type(self, response: httpx.Response) -> bool:
+        content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+        return not content_type or content_type in self.ALLOWED_CONTENT_TYPES
+
+    async def _read_bounded(self, response: httpx.Response, stop_text: str = None) -> tuple[bytes, bool]:
+        """Read the (decompressed) body up to max_page_bytes.
+
+        With `stop_text`, stop early once it has been seen and `stop_context_bytes` more bytes have been read.
 
+        Returns:
+            tuple: (body, whether the read was stopped early by `stop_text`)
+        """
+        probe = None
+        if stop_text:
+            probe = stop_text[: self.STOP_PROBE_CHARS].encode(response.charset_encoding or "utf-8", errors="ignore")
+        body = bytearray()
+        stop_at = None
+        async for chunk in response.aiter_bytes():
+            body.extend(chunk)
+            if probe and stop_at is None:
+                found = body.find(probe, max(0, len(body) - len(chunk) - len(probe)))
+                if found != -1:
+                    stop_at = found + len(stop_text) + self.stop_context_bytes
+            if len(body) >= self.max_page_bytes:
+                break
+            if stop_at is not None and len(body) >= stop_at:
+                return bytes(body[: self.max_page_bytes]), True
+        return bytes(body[: self.max_page_bytes]), False
 
-async def httpx_bind_key(url: str, headers: dict, key: str = ""):
-    flag, response = await httpx_get(url, headers)
-    return flag, response, url, key
+    async def get(self, url: str, key: str = "", stop_text: str = None, validators: dict = None):
+        """Fetch a single HTML page with a bounded, streaming read.
 
+        PDFs are skipped before any request, non-HTML responses are aborted after the headers, and at most
+        max_page_bytes are read. The returned response holds the (possibly truncated) decompressed body, its
+        `extensions["truncated"]` tells whether the read was stopped early by `stop_text`.
 
-def crawl_web(query_url_dict: dict):
-    tasks = list()
+        Args:
+            url (str): the URL to fetch.
+            key (str, optional): returned as-is, usually the query of the URL. Defaults to "".
+            stop_text (str, optional): stop reading once this text and its context window have been read. Defaults to None.
+            validators (dict, optional): conditional request headers (If-None-Match/If-Modified-Since). Defaults to None.
+
+        Returns:
+            tuple: (flag, response, url, key), where flag is True and response is set only for status 200, or
+                for status 304 (without a body) when `validators` are given.
+        """
+        if urlsplit(url).path.lower().endswith(".pdf"):
+            return False, None, url, key
+        client = await self._ensure_client()
+        try:
+            async with self._host_semaphore(url):
+                async with client.stream("GET", url, headers=validators) as response:
+                    if validators and response.status_code == 304:
+                        return True, httpx.Response(304, headers=response.headers, request=response.request), url, key
+                    if response.status_code != 200 or not self._is_allowed_content_type(response):
+                        return False, None, url, key
+                    body, truncated = await self._read_bounded(response, stop_text=stop_text)
+            # the body is already decompressed, drop the headers describing the wire format
+            page_headers = [
+                (k, v) for k, v in response.headers.multi_items() if k.lower() not in ("content-encoding", "content-length")
+            ]
+            page = httpx.Response(
+                200, headers=page_headers, content=body, request=response.request, extensions={"truncated": truncated}
+            )
+            return True, page, url, key
+        except Exception as e:  # noqa: F841
+            pass
+        return False, None, url, key
+
+    async def _crawl(self, query_url_dict: dict, stop_texts: dict = None, validators: dict = None):
+        stop_texts = stop_texts or dict()
+        validators = validators or dict()
+        tasks = [
+            self.get(url, key=query, stop_text=stop_texts.get((query, url)), validators=validators.get(url))
+            for query, urls in query_url_dict.items()
+            for url in urls
+        ]
+        return await asyncio.gather(*tasks)
+
+    def crawl(self, query_url_dict: dict, stop_texts: dict = None, validators: dict = None):
+        """Fetch all URLs of a {query: [urls]} dict concurrently, see `get` for the result tuples.
+
+        Args:
+            query_url_dict (dict): a dictionary of queries and their corresponding urls.
+            stop_texts (dict, optional): {(query, url): text} to stop reading a page early, see `get`. Defaults to None.
+            validators (dict, optional): {url: conditional request headers}, see `get`. Defaults to None.
+        """
+        return self._loop_thread.run(self._crawl(query_url_dict, stop_texts=stop_texts, validators=validators))
+
+    async def _close_client(self):
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._host_semaphores = dict()
+
+    def close(self):
+        """Close the pooled client and stop the background event loop."""
+        if self._loop_thread.running:
+            self._loop_thread.stop(cleanup=self._close_client)
+
+
+_shared_crawler = None
+_shared_crawler_lock = threading.Lock()
+
+
+def get_crawler(api_config: dict = None) -> WebCrawler:
+    """Return the process-wide crawler, created from the api configuration on first use."""
+    global _shared_crawler
+    with _shared_crawler_lock:
+        if _shared_crawler is None:
+            _shared_crawler = WebCrawler.from_config(api_config)
+        return _shared_crawler
+
+
+def crawl_web(query_url_dict: dict, crawler: WebCrawler = None, stop_texts: dict = None, validators: dict = None):
+    crawler = crawler or get_crawler()
+    return crawler.crawl(query_url_dict, stop_texts=stop_texts, validators=validators)
+
+
+def crawl_web_cached(query_url_dict: dict, crawler: WebCrawler = None, page_cache: PageCache = None, stop_texts: dict = None):
+    """Crawl through the page cache.
+
+    Fresh cached pages are not requested, stale ones are revalidated with a conditional GET and kept if the
+    server answers 304 (or if the request fails). Only new or changed pages are returned for parsing; the
+    caller stores their extracted text with `page_cache.store`.
+
+    Args:
+        query_url_dict (dict): a dictionary of queries and their corresponding urls.
+        crawler (WebCrawler, optional): the crawler, the process-wide one if None. Defaults to None.
+        page_cache (PageCache, optional): the page cache, plain `crawl_web` if None. Defaults to None.
+        stop_texts (dict, optional): {(query, url): text} to stop reading a page early, see `WebCrawler.get`. Defaults to None.
+
+    Returns:
+        tuple: ({(query, url): cached text}, [(flag, response, url, query)] of the pages to parse)
+    """
+    if page_cache is None:
+        return {}, crawl_web(query_url_dict, crawler=crawler, stop_texts=stop_texts)
+
+    entries, cached_texts, validators, to_crawl = {}, {}, {}, {}
     for query, urls in query_url_dict.items():
         for url in urls:
-            task = httpx_bind_key(url=url, headers=headers, key=query)
-            tasks.append(task)
-    asyncio.set_event_loop(asyncio.SelectorEventLoop())
-    loop = asyncio.get_event_loop()
-    responses = loop.run_until_complete(asyncio.gather(*tasks))
-    return responses
+            if url not in entries:
+                entries[url] = page_cache.lookup(url)
+            entry, fresh = entries[url]
+            if fresh:
+                cached_texts[(query, url)] = entry["text"]
+                continue
+            to_crawl.setdefault(query, []).append(url)
+            if entry is not None:
+                validators[url] = page_cache.conditional_headers(entry)
+
+    responses = crawl_web(to_crawl, crawler=crawler, stop_texts=stop_texts, validators=validators) if to_crawl else []
+    to_parse, refreshed = [], set()
+    for flag, response, url, query in responses:
+        entry = entries[url][0]
+        if flag and response.status_code == 200:
+            to_parse.append((flag, response, url, query))
+        elif entry is not None:
+            # not modified, or the page can not be fetched right now: keep serving the cached text
+            if flag and url not in refreshed:
+                page_cache.refresh(url, entry, response)
+                refreshed.add(url)
+            cached_texts[(query, url)] = entry["text"]
+    logger.info(f"Page cache: {len(cached_texts)} pages served from cache, {len(to_parse)} to parse.")
+    return cached_texts, to_parse
 
 
 # @backoff.on_exception(backoff.expo, (requests.exceptions.RequestException, requests.exceptions.Timeout), max_tries=1,max_time=3)
@@ -75,30 +380,22 @@ def common_web_request(url: str, query: str = None, timeout: int = 3):
         return resp
 
 
-def parse_response(response: requests.Response, url: str, query: str = None):
-    html_content = response.text
-    url = url
+def parse_response(response: requests.Response, url: str, query: str = None, extractor: BaseExtractor = None):
+    extractor = extractor or get_extractor()
     try:
-        soup = bs4.BeautifulSoup(html_content, "html.parser")
-        texts = soup.findAll(text=True)
-        # Filter out invisible text from the page.
-        visible_text = filter(is_tag_visible, texts)
+        web_text = extractor.extract(response.text)
     except Exception as _:  # noqa: F841
         return None, url, query
-
-    # Returns all the text concatenated as a string.
-    web_text = " ".join(t.strip() for t in visible_text).strip()
-    # Clean up spacing.
-    web_text = " ".join(web_text.split())
     return web_text, url, query
 
 
-def scrape_url(url: str, timeout: float = 3):
+def scrape_url(url: str, timeout: float = 3, extractor: BaseExtractor = None):
     """Scrapes a URL for all text information.
 
     Args:
         url: URL of webpage to scrape.
         timeout: Timeout of the requests call.
+        extractor: HTML-to-text extractor, the fastest installed one if None.
     Returns:
         web_text: The visible text of the scraped URL.
         url: URL input.
@@ -110,19 +407,12 @@ def scrape_url(url: str, timeout: float = 3):
     except requests.exceptions.RequestException as _:  # noqa: F841
         return None, url
 
-    # Extract out all text from the tags
+    # Extract out all visible text from the tags
+    extractor = extractor or get_extractor()
     try:
-        soup = bs4.BeautifulSoup(response.text, "html.parser")
-        texts = soup.findAll(text=True)
-        # Filter out invisible text from the page.
-        visible_text = filter(is_tag_visible, texts)
+        web_text = extractor.extract(response.text)
     except Exception as _:  # noqa: F841
         return None, url
-
-    # Returns all the text concatenated as a string.
-    web_text = " ".join(t.strip() for t in visible_text).strip()
-    # Clean up spacing.
-    web_text = " ".join(web_text.split())
     return web_text, url
 
 
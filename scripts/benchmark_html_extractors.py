@@ -0,0 +1,133 @@
+"""Benchmark the HTML-to-text extractors on saved pages.
+
+Reports the throughput of every installed backend and how close its output is to the bs4 reference. Every run
+first checks that boilerplate removal keeps the content of page layouts it once emptied.
+
+    python scripts/benchmark_html_extractors.py --pages saved_pages/
+    python scripts/benchmark_html_extractors.py --pages saved_pages/ --fetch urls.txt  # save the pages first
+    python scripts/benchmark_html_extractors.py --check-only
+"""
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from factcheck.utils.web_util import headers  # noqa: E402
+from factcheck.utils.html_extractor import get_extractor, available_extractors  # noqa: E402
+
+
+def fetch_pages(url_file: str, page_dir: str, timeout: float = 5):
+    os.makedirs(page_dir, exist_ok=True)
+    with open(url_file, encoding="utf-8") as f:
+        urls = [line.strip() for line in f if line.strip()]
+    for url in urls:
+        try:
+            response = requests.get(url, headers=headers, timeout=timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"skip {url}: {e}")
+            continue
+        name = hashlib.md5(url.encode("utf-8")).hexdigest() + ".html"
+        with open(os.path.join(page_dir, name), "w", encoding="utf-8") as f:
+            f.write(response.text)
+
+
+def load_pages(page_dir: str) -> list[str]:
+    pages = []
+    for name in sorted(os.listdir(page_dir)):
+        if name.endswith((".html", ".htm")):
+            with open(os.path.join(page_dir, name), encoding="utf-8", errors="ignore") as f:
+                pages.append(f.read())
+    return pages
+
+
+# layouts whose content sits inside an element that looks like page chrome, and the text that must survive
+REGRESSION_PAGES = {
+    # ASP.NET WebForms: the whole body is one server-side form
+    "form-wrapped body": (
+        '<html><body><form method="post" action="./article.aspx" id="form1"><div class="article">'
+        "<h1>Council approves budget</h1><p>The city council approved the 2024 budget on Tuesday.</p>"
+        "</div></form></body></html>",
+        "The city council approved the 2024 budget on Tuesday.",
+    ),
+    # the article lede inside the header element
+    "header lede": (
+        "<html><body><article><header><h1>Council approves budget</h1>"
+        "<p>The city council approved the 2024 budget on Tuesday.</p></header>"
+        "<p>Details follow.</p></article></body></html>",
+        "The city council approved the 2024 budget on Tuesday.",
+    ),
+}
+
+
+def check_regressions() -> bool:
+    ok = True
+    for name in available_extractors():
+        extractor = get_extractor(name, remove_boilerplate=True)
+        for case, (page, expected) in REGRESSION_PAGES.items():
+            if expected not in extractor.extract(page):
+                print(f"FAIL {name}: boilerplate removal drops the content of a {case} page")
+                ok = False
+    print("Regression checks " + ("passed." if ok else "failed."))
+    return ok
+
+
+def jaccard(a: str, b: str) -> float:
+    a, b = set(a.split()), set(b.split())
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def benchmark(pages: list[str], remove_boilerplate: bool, repeat: int):
+    reference = get_extractor("bs4", remove_boilerplate=remove_boilerplate)
+    reference_texts = [reference.extract(page) for page in pages]
+    total_mb = sum(len(page.encode("utf-8")) for page in pages) * repeat / 1e6
+
+    print(f"\n{len(pages)} pages, remove_boilerplate={remove_boilerplate}")
+    print(f"{'extractor':<12}{'pages/s':>10}{'MB/s':>10}{'speedup':>10}{'jaccard':>10}{'len ratio':>11}")
+    bs4_time = None
+    for name in available_extractors():
+        extractor = get_extractor(name, remove_boilerplate=remove_boilerplate)
+        st = time.perf_counter()
+        for _ in range(repeat):
+            texts = [extractor.extract(page) for page in pages]
+        elapsed = time.perf_counter() - st
+        bs4_time = elapsed if name == "bs4" else bs4_time
+
+        similarity = sum(jaccard(t, r) for t, r in zip(texts, reference_texts)) / len(pages)
+        len_ratio = sum(len(t) for t in texts) / max(1, sum(len(r) for r in reference_texts))
+        speedup = bs4_time / elapsed if bs4_time else 1.0
+        print(
+            f"{name:<12}{len(pages) * repeat / elapsed:>10.1f}{total_mb / elapsed:>10.2f}"
+            f"{speedup:>10.1f}{similarity:>10.3f}{len_ratio:>11.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=str, default=None, help="directory of saved .html pages")
+    parser.add_argument("--fetch", type=str, default=None, help="file with one URL per line to save into --pages first")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--check-only", action="store_true", help="only run the regression checks")
+    args = parser.parse_args()
+
+    if not check_regressions():
+        sys.exit(1)
+    if args.check_only:
+        sys.exit(0)
+    if args.pages is None:
+        parser.error("--pages is required unless --check-only is given")
+
+    if args.fetch:
+        fetch_pages(args.fetch, args.pages)
+    pages = load_pages(args.pages)
+    if not pages:
+        sys.exit(f"No .html pages found in {args.pages}")
+    for remove_boilerplate in [False, True]:
+        benchmark(pages, remove_boilerplate=remove_boilerplate, repeat=args.repeat)
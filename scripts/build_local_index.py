@@ -0,0 +1,52 @@
+"""Build the BM25 index searched by the `local` retriever.
+
+The corpus is a JSONL file with one {"text": ..., "url": ...} document per line, or a directory of .txt/.md
+files (the file path is used as the url).
+
+    python scripts/build_local_index.py --corpus wiki.jsonl --output cache/local_index
+    python scripts/build_local_index.py --corpus filings/ --output cache/local_index --passage-tokens 96
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from factcheck.utils.bm25_index import BM25Index  # noqa: E402
+
+
+def read_corpus(corpus: str):
+    if os.path.isdir(corpus):
+        for root, _, files in os.walk(corpus):
+            for name in sorted(files):
+                if name.endswith((".txt", ".md")):
+                    path = os.path.join(root, name)
+                    with open(path, encoding="utf-8", errors="ignore") as f:
+                        yield {"text": f.read(), "url": path}
+        return
+    with open(corpus, encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            if not line.strip():
+                continue
+            document = json.loads(line)
+            url = document.get("url") or document.get("id") or document.get("title") or f"{corpus}:{i + 1}"
+            yield {"text": document.get("text", ""), "url": str(url)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", type=str, required=True, help="JSONL file of documents or directory of .txt/.md files")
+    parser.add_argument("--output", type=str, default="cache/local_index")
+    parser.add_argument("--passage-tokens", type=int, default=128)
+    parser.add_argument("--k1", type=float, default=1.5)
+    parser.add_argument("--b", type=float, default=0.75)
+    args = parser.parse_args()
+
+    st = time.perf_counter()
+    meta = BM25Index.build(
+        read_corpus(args.corpus), args.output, passage_tokens=args.passage_tokens, k1=args.k1, b=args.b
+    )
+    print(json.dumps(meta, indent=2))
+    print(f"Built {args.output} in {time.perf_counter() - st:.1f}s")